@@ -1,11 +1,13 @@
+from langchain_core.documents import Document
 from langchain_core.language_models import BaseLanguageModel
+from langchain_core.runnables import RunnableConfig
 
 from core.constants import TaskType
 from .base import BaseAgent
 from core.prompts import prompt_manager
 from langchain_core.messages import HumanMessage, SystemMessage
 from config.settings import config
-from typing import Dict, Any
+from typing import Dict, Any, List
 import logging
 import re
 
@@ -24,13 +26,15 @@ class CodeAnalyzerAgent(BaseAgent):
             "analysis", "analysis_validation"
         )
 
-    def execute(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    def execute(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
         """Execute code analysis with quality control gates"""
         try:
             # Build and validate analysis
-            analysis = self._generate_analysis(state)
+            docs = self._retrieved_docs(state, config)
+            analysis = self.llm.invoke(self._analysis_messages(state, docs)).content
 
-            if not self._validate_analysis(analysis):
+            response = self.llm.invoke(self._validation_messages(analysis)).content
+            if not self._is_valid(response):
                 raise ValueError("Analysis validation failed")
 
             return self._update_state(state, analysis)
@@ -39,13 +43,31 @@ class CodeAnalyzerAgent(BaseAgent):
             logger.error(f"Analysis failed: {str(e)}")
             return self._handle_error(state, "Analysis generation failed")
 
-    def _generate_analysis(self, state: Dict[str, Any]) -> str:
-        """Generate technical analysis using structured prompt"""
+    async def aexecute(
+        self, state: Dict[str, Any], config: RunnableConfig
+    ) -> Dict[str, Any]:
+        try:
+            docs = self._retrieved_docs(state, config)
+            message = await self.llm.ainvoke(self._analysis_messages(state, docs))
+            analysis = message.content
+
+            response = await self.llm.ainvoke(self._validation_messages(analysis))
+            if not self._is_valid(response.content):
+                raise ValueError("Analysis validation failed")
+
+            return self._update_state(state, analysis)
+
+        except Exception as e:
+            logger.error(f"Analysis failed: {str(e)}")
+            return self._handle_error(state, "Analysis generation failed")
+
+    def _analysis_messages(self, state: Dict[str, Any], docs: List[Document]) -> list:
+        """Build technical analysis request using structured prompt"""
         prompt = self.analysis_prompt_template.format(
             problem_stmt=self.common_utils.truncate_text(
                 state["problem_stmt"], 200, config.workflow.max_content_length // 8
             ),
-            code_context=self._format_code_context(state["retrieved_docs"]),
+            code_context=self._format_code_context(docs),
             previous_analysis=self._summarize_previous_analysis(state),
             review_feedback=self.common_utils.truncate_text(
                 state.get("review_feedback", ""),
@@ -55,27 +77,26 @@ class CodeAnalyzerAgent(BaseAgent):
             - state["analysis_attempts"],
         )
 
-        messages = [SystemMessage(content=prompt)]
-        return self.llm.invoke(messages).content
+        return [SystemMessage(content=prompt)]
 
-    def _validate_analysis(self, analysis: str) -> bool:
-        """Ensure analysis meets quality standards"""
-        messages = [
+    def _validation_messages(self, analysis: str) -> list:
+        """Ask the LLM whether analysis meets quality standards"""
+        return [
             SystemMessage(content=self.validation_prompt_template),
             HumanMessage(content=analysis),
         ]
-        response = self.llm.invoke(messages).content
+
+    def _is_valid(self, response: str) -> bool:
         return "VALID" in response.upper()
 
     def _update_state(self, state: Dict[str, Any], analysis: str) -> Dict[str, Any]:
         """Update workflow state with new analysis"""
         return {
-            **state,
             "analysis": analysis,
-            "analysis_history": state["analysis_history"] + [analysis],
-            "analysis_attempts": state["analysis_attempts"] + 1,
+            "analysis_history": [analysis],
+            "analysis_attempts": 1,
             "current_task": self._determine_next_step(state),
-            "token_count": state["token_count"] + self._calculate_token_usage(analysis),
+            "token_count": self._calculate_token_usage(analysis),
         }
 
     def _summarize_previous_analysis(self, state: Dict[str, Any]) -> str:
@@ -103,8 +124,8 @@ class CodeAnalyzerAgent(BaseAgent):
         )
 
     def _determine_next_step(self, state: Dict[str, Any]) -> str:
-        """Determine next workflow step"""
-        if state["analysis_attempts"] >= config.workflow.max_analysis_attempts:
+        """Determine next workflow step, counting the attempt just made"""
+        if state["analysis_attempts"] + 1 >= config.workflow.max_analysis_attempts:
             return TaskType.EDITING
         return TaskType.SOFTWARE_ENGINEER
 
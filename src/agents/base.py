@@ -1,9 +1,13 @@
 from abc import ABC, abstractmethod
 from config.settings import config
 from core.constants import TaskType
+from core.retriever import HybridRetriever
+from core.spans import coalesce_spans, span_header
 from utils.common_utils import CommonUtils
+from langchain_core.documents import Document
 from langchain_core.language_models import BaseLanguageModel
-from typing import Any, Dict
+from langchain_core.runnables import RunnableConfig
+from typing import Any, Dict, List
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,40 +18,69 @@ class BaseAgent(ABC):
         self.llm = llm
         self.common_utils = CommonUtils
 
+    # Nodes return only the channels they change; the state's reducers merge them
+
     @abstractmethod
-    def execute(self, state: dict) -> dict:
+    def execute(self, state: dict, config: RunnableConfig) -> dict:
+        pass
+
+    @abstractmethod
+    async def aexecute(self, state: dict, config: RunnableConfig) -> dict:
         pass
 
     def _handle_error(self, state: Dict[str, Any], error_msg: str) -> Dict[str, Any]:
         logger.error(error_msg)
         return {
-            **state,
             "current_task": TaskType.SOFTWARE_ENGINEER,
             "failure_reason": error_msg,
-            "token_count": state.get("token_count", 0) + 500,
         }
 
-    def _update_token_count(self, state: Dict[str, Any], new_content: str) -> int:
-        return state.get("token_count", 0) + self.common_utils.calculate_tokens(
-            new_content
-        )
+    @staticmethod
+    def _retriever(config: RunnableConfig) -> HybridRetriever:
+        """The retriever of the instance the graph is running for"""
+        return config["configurable"]["retriever"]
+
+    def _retrieved_docs(
+        self, state: Dict[str, Any], config: RunnableConfig
+    ) -> List[Document]:
+        """Chunks the engineer last retrieved, resolved from their ids"""
+        return self._retriever(config).get_chunks(state["retrieved_chunk_ids"])
+
+    def _doc_tokens(self, doc) -> int:
+        """Token count of a chunk, from ingestion metadata when available"""
+        count = doc.metadata.get("token_count")
+        if count is None:
+            count = self.common_utils.calculate_tokens(doc.page_content)
+        return count
+
+    def _truncate_doc(self, doc, max_tokens: int, max_chars: int = None) -> str:
+        """Truncate a chunk, skipping tokenization when its stored count fits"""
+        content = doc.page_content
+        if doc.metadata.get("token_count", max_tokens + 1) <= max_tokens and (
+            max_chars is None or len(content) <= max_chars
+        ):
+            return content
+        return self.common_utils.truncate_text(content, max_tokens, max_chars)
 
     def _format_code_context(self, docs: list) -> str:
         """Format retrieved docs for analysis context"""
-        context = (
-            "\n".join(
-                [
-                    f"### {doc.metadata.get('source', 'Unknown')}\n"
-                    f"{self.common_utils.truncate_text(doc.page_content, 500, 2000)}"
-                    for doc in docs
-                ]
-            )
-            if docs
-            else "No relevant code context found"
-        )
+        if not docs:
+            return "No relevant code context found"
 
-        return self.common_utils.truncate_text(
-            context,
-            config.workflow.max_context_tokens // 2,
-            config.workflow.max_content_length // 4,
+        docs = coalesce_spans(docs)
+        headers = [span_header(doc, "Unknown") for doc in docs]
+        context = "\n".join(
+            header + self._truncate_doc(doc, 500, 2000)
+            for header, doc in zip(headers, docs)
+        )
+        max_tokens = config.workflow.max_context_tokens // 2
+        max_chars = config.workflow.max_content_length // 4
+        # Each doc adds at most 500 tokens plus an ellipsis; its header and
+        # separator are bounded by their length for ASCII paths
+        token_bound = sum(
+            min(self._doc_tokens(doc), 500) + len(header) + 2
+            for header, doc in zip(headers, docs)
         )
+        if token_bound <= max_tokens and len(context) <= max_chars:
+            return context
+        return self.common_utils.truncate_text(context, max_tokens, max_chars)
@@ -1,10 +1,13 @@
 from core.constants import TaskType
 from .base import BaseAgent
+from core.context_packer import ContextPacker
 from core.prompts import prompt_manager
 from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.documents import Document
 from langchain_core.language_models import BaseLanguageModel
+from langchain_core.runnables import RunnableConfig
 from config.settings import config
-from typing import Dict, Any
+from typing import Dict, Any, List
 import re
 import logging
 
@@ -21,56 +24,70 @@ class EditorAgent(BaseAgent):
             "editing", "validation"
         )
 
-    def execute(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    def execute(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
         """Generate and validate code patches with quality control"""
         try:
-            context = self._assemble_context(state)
+            docs = self._retrieved_docs(state, config)
+            raw_patch = self.llm.invoke(self._build_messages(state, docs)).content
+
+            if self._validate_patch_structure(raw_patch):
+                response = self.llm.invoke(
+                    self._content_validation_messages(raw_patch, state)
+                )
+                validated_patch = self._check_patch_content(raw_patch, response.content)
+            else:
+                validated_patch = "INVALID: Malformed diff structure"
 
-            messages = [
-                SystemMessage(content=self._build_system_prompt(state)),
-                HumanMessage(content=self._build_human_prompt(state, context)),
-            ]
+            return self._update_state(state, validated_patch)
 
-            raw_patch = self.llm.invoke(messages).content
-            validated_patch = self._validate_patch(raw_patch, state)
+        except Exception as e:
+            return self._handle_error(state, f"Patch generation failed: {str(e)}")
+
+    async def aexecute(
+        self, state: Dict[str, Any], config: RunnableConfig
+    ) -> Dict[str, Any]:
+        try:
+            docs = self._retrieved_docs(state, config)
+            message = await self.llm.ainvoke(self._build_messages(state, docs))
+            raw_patch = message.content
+
+            if self._validate_patch_structure(raw_patch):
+                response = await self.llm.ainvoke(
+                    self._content_validation_messages(raw_patch, state)
+                )
+                validated_patch = self._check_patch_content(raw_patch, response.content)
+            else:
+                validated_patch = "INVALID: Malformed diff structure"
 
             return self._update_state(state, validated_patch)
 
         except Exception as e:
             return self._handle_error(state, f"Patch generation failed: {str(e)}")
 
-    def _assemble_context(self, state: Dict[str, Any]) -> str:
-        """Build code context with smart token allocation"""
-        token_budget = config.workflow.max_context_tokens - state["token_count"]
-        context_parts = []
+    def _build_messages(self, state: Dict[str, Any], docs: List[Document]) -> list:
+        context = self._assemble_context(state, docs)
+        return [
+            SystemMessage(content=self._build_system_prompt(state)),
+            HumanMessage(content=self._build_human_prompt(state, context)),
+        ]
 
-        problem_stmt = self.common_utils.truncate_text(
+    def _problem_statement(self, state: Dict[str, Any]) -> str:
+        return self.common_utils.truncate_text(
             state["problem_stmt"],
-            token_budget // 4,
+            config.workflow.editor_context_tokens // 4,
             config.workflow.max_content_length // 10,
         )
-        context_parts.append(f"## Problem Statement\n{problem_stmt}")
-        remaining_tokens = token_budget - self.common_utils.calculate_tokens(
-            problem_stmt
-        )
-
-        code_context = []
-        for doc in state["retrieved_docs"]:
-            content = f"### {doc.metadata.get('source', 'unknown')}\n{doc.page_content}"
-            tokens_needed = self.common_utils.calculate_tokens(content)
-
-            if tokens_needed <= remaining_tokens:
-                code_context.append(content)
-                remaining_tokens -= tokens_needed
-            else:
-                truncated = self.common_utils.truncate_text(content, remaining_tokens)
-                code_context.append(truncated)
-                break
 
-        if code_context:
-            context_parts.append("## Relevant Code Context\n" + "\n".join(code_context))
+    def _assemble_context(self, state: Dict[str, Any], docs: List[Document]) -> str:
+        """Pack retrieved code into what is left of the editor's token budget"""
+        token_budget = min(
+            config.workflow.editor_context_tokens,
+            config.workflow.max_context_tokens - state["token_count"],
+        ) - self.common_utils.calculate_tokens(self._problem_statement(state))
 
-        return "\n\n".join(context_parts)
+        context, report = ContextPacker(token_budget).pack(docs)
+        logger.debug(f"Packed editor context: {report.model_dump()}")
+        return context or "No relevant code context found"
 
     def _build_system_prompt(self, state: Dict[str, Any]) -> str:
         """Construct system-level instructions"""
@@ -82,53 +99,41 @@ class EditorAgent(BaseAgent):
     def _build_human_prompt(self, state: Dict[str, Any], context: str) -> str:
         """Build task-specific prompt content"""
         return self.human_prompt_template.format(
-            problem_stmt=self.common_utils.truncate_text(
-                state["problem_stmt"], 200, config.workflow.max_content_length // 10
-            ),
+            problem_stmt=self._problem_statement(state),
             analysis_summary=self._summarize_analysis(state["analysis"]),
-            code_context=self.common_utils.truncate_text(
-                context, 3000, config.workflow.max_content_length // 2
-            ),
+            code_context=context,
             previous_attempts=self._format_attempts(state["edit_history"]),
             review_feedback=self.common_utils.truncate_text(
                 state.get("review_feedback", ""), 200, 500
             ),
         )
 
-    def _validate_patch(self, patch: str, state: Dict[str, Any]) -> str:
-        """Multi-stage patch validation"""
-        if not self._validate_patch_structure(patch):
-            return "INVALID: Malformed diff structure"
-
-        if not self._validate_patch_content(patch, state):
-            return "INVALID: Does not address problem"
-
-        return patch
-
     def _validate_patch_structure(self, patch: str) -> bool:
-        """Validate basic diff syntax"""
+        """First validation stage: basic diff syntax"""
         return self.common_utils.validate_diff_structure(patch)
 
-    def _validate_patch_content(self, patch: str, state: Dict[str, Any]) -> bool:
-        """Semantic validation using LLM"""
-        messages = [
+    def _content_validation_messages(self, patch: str, state: Dict[str, Any]) -> list:
+        """Second validation stage: semantic validation using LLM"""
+        return [
             SystemMessage(content=self.validation_prompt_template),
             HumanMessage(content=f"Problem: {state['problem_stmt']}\nPatch:\n{patch}"),
         ]
-        response = self.llm.invoke(messages).content
-        return "VALID" in response.upper()
+
+    def _check_patch_content(self, patch: str, response: str) -> str:
+        if "VALID" not in response.upper():
+            return "INVALID: Does not address problem"
+        return patch
 
     def _update_state(self, state: Dict[str, Any], patch: str) -> Dict[str, Any]:
         """Update workflow state with token tracking"""
         return {
-            **state,
             "generated_patch": patch,
-            "edit_history": state["edit_history"] + [patch],
+            "edit_history": [patch],
+            "edit_attempts": 1,
             "current_task": TaskType.REVIEW
             if "INVALID" not in patch
             else TaskType.SOFTWARE_ENGINEER,
-            "token_count": state["token_count"]
-            + self.common_utils.calculate_tokens(patch),
+            "token_count": self.common_utils.calculate_tokens(patch),
         }
 
     def _summarize_analysis(self, analysis: str) -> str:
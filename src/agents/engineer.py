@@ -2,51 +2,81 @@ from core.constants import TaskType
 from .base import BaseAgent
 from config.settings import config
 from core.prompts import prompt_manager
-from core.retriever import HybridRetriever
+from core.spans import coalesce_spans, span_label
+from langchain_core.documents import Document
 from langchain_core.language_models import BaseLanguageModel
 from langchain_core.messages import SystemMessage
-from typing import Dict, Any
+from langchain_core.runnables import RunnableConfig
+from typing import Dict, Any, List
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class SoftwareEngineerAgent(BaseAgent):
-    def __init__(self, llm: BaseLanguageModel, retriever: HybridRetriever):
+    def __init__(self, llm: BaseLanguageModel):
         super().__init__(llm)
-        self.retriever = retriever
         self.decision_prompt_template = prompt_manager.get_prompt(
             "engineer", "decision_prompt"
         )
 
-    def execute(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    def execute(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
         try:
-            retrieved_docs = self.retriever.retrieve(
+            retriever = self._retriever(config)
+            retrieved_docs = retriever.retrieve(
                 state["problem_stmt"], state.get("review_feedback", "")
             )
-
-            messages = [
-                SystemMessage(
-                    content=self.common_utils.truncate_text(
-                        self._build_prompt(state),
-                        config.workflow.max_context_tokens,
-                        config.workflow.max_content_length,
-                    )
-                )
-            ]
+            messages = self._build_messages(state, self._retrieved_docs(state, config))
             response = self.llm.invoke(messages).content
-            next_task = self._parse_response(response)
 
-            return {
-                **state,
-                "retrieved_docs": retrieved_docs,
-                "current_task": next_task,
-                "token_count": self._update_token_count(state, response),
-            }
+            return self._update_state(
+                state, retriever.chunk_ids(retrieved_docs), response
+            )
+        except Exception as e:
+            return self._handle_error(state, f"Decision failed: {str(e)}")
+
+    async def aexecute(
+        self, state: Dict[str, Any], config: RunnableConfig
+    ) -> Dict[str, Any]:
+        try:
+            retriever = self._retriever(config)
+            messages = self._build_messages(state, self._retrieved_docs(state, config))
+            # The decision prompt summarizes the previous docs, so both calls overlap
+            retrieved_docs, message = await asyncio.gather(
+                retriever.aretrieve(
+                    state["problem_stmt"], state.get("review_feedback", "")
+                ),
+                self.llm.ainvoke(messages),
+            )
+
+            return self._update_state(
+                state, retriever.chunk_ids(retrieved_docs), message.content
+            )
         except Exception as e:
             return self._handle_error(state, f"Decision failed: {str(e)}")
 
-    def _build_prompt(self, state: Dict[str, Any]) -> str:
+    def _build_messages(self, state: Dict[str, Any], docs: List[Document]) -> list:
+        return [
+            SystemMessage(
+                content=self.common_utils.truncate_text(
+                    self._build_prompt(state, docs),
+                    config.workflow.max_context_tokens,
+                    config.workflow.max_content_length,
+                )
+            )
+        ]
+
+    def _update_state(
+        self, state: Dict[str, Any], chunk_ids: List[str], response: str
+    ) -> Dict[str, Any]:
+        return {
+            "retrieved_chunk_ids": chunk_ids,
+            "current_task": self._parse_response(response),
+            "token_count": self.common_utils.calculate_tokens(response),
+        }
+
+    def _build_prompt(self, state: Dict[str, Any], docs: List[Document]) -> str:
         return self.decision_prompt_template.format(
             problem_stmt=self.common_utils.truncate_text(state["problem_stmt"], 200),
             analysis_attempts=state["analysis_attempts"],
@@ -56,7 +86,7 @@ class SoftwareEngineerAgent(BaseAgent):
             review_feedback=self.common_utils.truncate_text(
                 state.get("review_feedback", ""), 200
             ),
-            docs_summary=self._summarize_docs(state["retrieved_docs"]),
+            docs_summary=self._summarize_docs(docs),
         )
 
     def _summarize_analysis(self, state: Dict[str, Any]) -> str:
@@ -75,8 +105,8 @@ class SoftwareEngineerAgent(BaseAgent):
         return (
             "\n".join(
                 [
-                    f"• {d.metadata.get('source', 'unknown')}: {self.common_utils.truncate_text(d.page_content, 500)}"
-                    for d in docs
+                    f"• {span_label(d)}: {self._truncate_doc(d, 500)}"
+                    for d in coalesce_spans(docs)
                 ]
             )
             if docs
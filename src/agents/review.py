@@ -1,4 +1,5 @@
 from langchain_core.language_models import BaseLanguageModel
+from langchain_core.runnables import RunnableConfig
 
 from core.constants import ReviewStatus, TaskType
 from .base import BaseAgent
@@ -28,15 +29,10 @@ class ReviewAgent(BaseAgent):
             r"STATUS:\s*(APPROVED|REJECTED)", re.IGNORECASE
         )
 
-    def execute(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    def execute(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
         """Execute comprehensive code review with quality gates"""
         try:
-            messages = [
-                SystemMessage(content=self._build_system_prompt(state)),
-                HumanMessage(content=self._build_human_prompt(state)),
-            ]
-
-            feedback = self.llm.invoke(messages).content
+            feedback = self.llm.invoke(self._build_messages(state)).content
             status = self._determine_status(feedback)
 
             return self._update_state(state, feedback, status)
@@ -44,6 +40,24 @@ class ReviewAgent(BaseAgent):
             logger.error(f"Review failed: {str(e)}")
             return self._handle_error(state, "Review process failed")
 
+    async def aexecute(
+        self, state: Dict[str, Any], config: RunnableConfig
+    ) -> Dict[str, Any]:
+        try:
+            message = await self.llm.ainvoke(self._build_messages(state))
+            status = self._determine_status(message.content)
+
+            return self._update_state(state, message.content, status)
+        except Exception as e:
+            logger.error(f"Review failed: {str(e)}")
+            return self._handle_error(state, "Review process failed")
+
+    def _build_messages(self, state: Dict[str, Any]) -> list:
+        return [
+            SystemMessage(content=self._build_system_prompt(state)),
+            HumanMessage(content=self._build_human_prompt(state)),
+        ]
+
     def _build_system_prompt(self, state: Dict[str, Any]) -> str:
         """Construct system prompt with validation criteria"""
         return self.system_prompt_template.format(
@@ -76,12 +90,10 @@ class ReviewAgent(BaseAgent):
     ) -> Dict[str, Any]:
         """Update state with review results"""
         return {
-            **state,
             "review_feedback": feedback,
-            "review_retry_count": state["review_retry_count"]
-            + (0 if status == ReviewStatus.APPROVED else 1),
+            "review_retry_count": 0 if status == ReviewStatus.APPROVED else 1,
             "current_task": self._determine_next_step(status, state),
-            "token_count": state["token_count"] + self._calculate_token_usage(feedback),
+            "token_count": self._calculate_token_usage(feedback),
         }
 
     def _calculate_token_usage(self, feedback: str) -> int:
@@ -112,6 +124,7 @@ class ReviewAgent(BaseAgent):
         """Determine workflow progression"""
         if status == ReviewStatus.APPROVED:
             return TaskType.COMPLETE
-        if state["review_retry_count"] >= config.workflow.max_review_attempts:
+        # The rejection being returned is not in the state yet
+        if state["review_retry_count"] + 1 >= config.workflow.max_review_attempts:
             return TaskType.FAILED
         return TaskType.SOFTWARE_ENGINEER
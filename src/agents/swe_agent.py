@@ -2,13 +2,15 @@ from config.settings import config
 from core.constants import TaskType
 from core.data_models import InstanceItem
 from core.retriever import HybridRetriever
-from langgraph.checkpoint.memory import MemorySaver
+from core.telemetry import timed
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.types import StateSnapshot
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.embeddings import Embeddings
 from langchain_core.language_models import BaseLanguageModel
 from core.state import WorkflowState
-from workflows.graph import build_workflow
-from utils.git_utils import setup_repository
-from typing import Dict, Any
+from utils.worktree_pool import worktree_pool
+from typing import Dict, Any, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,24 +18,81 @@ logger = logging.getLogger(__name__)
 
 class SWEBenchAgent:
     def __init__(
-        self, instance: InstanceItem, llm: BaseLanguageModel, embeddings: Embeddings
+        self,
+        instance: InstanceItem,
+        llm: BaseLanguageModel,
+        embeddings: Embeddings,
+        app: CompiledStateGraph,
+        callbacks: Optional[List[BaseCallbackHandler]] = None,
     ):
         self.instance = instance
         self.llm = llm
         self.embeddings = embeddings
-        self.repo_path = setup_repository(
-            repo_url=instance.repo, commit_hash=instance.base_commit
-        )
-        self.retriever = HybridRetriever(self.repo_path, self.llm, self.embeddings)
-        self.workflow = build_workflow(self.llm, self.retriever)
+        self.app = app
+        self.callbacks = callbacks or []
+        # The default git ingestion backend reads blobs straight from the
+        # mirror and nothing downstream reads the tree, so only the filesystem
+        # backend takes a worktree from the pool
+        self.checkout = config.retrieval.ingestion_backend != "git"
+        with timed("setup", "checkout"):
+            if self.checkout:
+                self.repo_path = worktree_pool.acquire(
+                    instance.repo, instance.base_commit
+                )
+            else:
+                self.repo_path = worktree_pool.mirror(
+                    instance.repo, instance.base_commit
+                )
+        try:
+            with timed("setup", "retriever"):
+                self.retriever = HybridRetriever(
+                    self.repo_path,
+                    self.llm,
+                    self.embeddings,
+                    commit=instance.base_commit,
+                    repo_name=instance.repo_name,
+                )
+        except Exception:
+            self.close()
+            raise
 
     def run_workflow(self) -> Dict[str, Any]:
-        initial_state: WorkflowState = {
+        run_config = self._run_config()
+        snapshot = self.app.get_state(run_config)
+        if snapshot.values and not snapshot.next:
+            result = snapshot.values
+        else:
+            result = self.app.invoke(self._workflow_input(snapshot), run_config)
+        # Checkpoints are kept only while an instance can still be resumed
+        self.app.checkpointer.delete_thread(self.instance.instance_id)
+        return result
+
+    async def arun_workflow(self) -> Dict[str, Any]:
+        run_config = self._run_config()
+        snapshot = await self.app.aget_state(run_config)
+        if snapshot.values and not snapshot.next:
+            result = snapshot.values
+        else:
+            result = await self.app.ainvoke(self._workflow_input(snapshot), run_config)
+        await self.app.checkpointer.adelete_thread(self.instance.instance_id)
+        return result
+
+    def _workflow_input(self, snapshot: StateSnapshot) -> Optional[WorkflowState]:
+        """None resumes an interrupted run from its last completed node"""
+        if snapshot.next:
+            logger.info(
+                f"Resuming {self.instance.instance_id} at {', '.join(snapshot.next)}"
+            )
+            return None
+        return self._initial_state()
+
+    def _initial_state(self) -> WorkflowState:
+        return {
             "instance_id": self.instance.instance_id,
             "problem_stmt": self.instance.problem_statement,
             "repo_path": self.repo_path,
             "current_task": TaskType.SOFTWARE_ENGINEER,
-            "retrieved_docs": [],
+            "retrieved_chunk_ids": [],
             "analysis": "",
             "analysis_history": [],
             "generated_patch": "",
@@ -42,15 +101,23 @@ class SWEBenchAgent:
             "review_feedback": "",
             "token_count": 0,
             "edit_history": [],
+            "edit_attempts": 0,
             "failure_reason": "",
         }
-        app = self.workflow.compile(checkpointer=MemorySaver())
-        return app.invoke(
-            initial_state,
-            {
-                "configurable": {"thread_id": config.workflow.thread_id},
-                "recursion_limit": config.workflow.max_analysis_attempts
-                + config.workflow.max_review_attempts
-                + config.workflow.recursion_additional_limit,
+
+    def _run_config(self) -> Dict[str, Any]:
+        return {
+            "configurable": {
+                "thread_id": self.instance.instance_id,
+                "retriever": self.retriever,
             },
-        )
+            "callbacks": self.callbacks,
+            "recursion_limit": config.workflow.max_analysis_attempts
+            + config.workflow.max_review_attempts
+            + config.workflow.recursion_additional_limit,
+        }
+
+    def close(self):
+        """Return the instance's worktree to the pool"""
+        if self.checkout:
+            worktree_pool.release(self.repo_path)
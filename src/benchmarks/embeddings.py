@@ -0,0 +1,116 @@
+"""Compare building a FAISS index through the embedding pipeline and directly.
+
+Chunks of a repository are embedded by the fake embedding server, once with
+``FAISS.from_documents`` and the provider's own sequential batching, then with
+``EmbeddingPipeline`` at each concurrency. Run from ``src/``::
+
+    python -m benchmarks.embeddings --repo ../repos/django__django --concurrency 1 4 8
+"""
+
+import argparse
+import time
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_openai import OpenAIEmbeddings
+from benchmarks.fake_embedding_server import start_server
+from config.settings import config
+from core.ingestion import RepositoryIngestor
+from core.providers.embedding_pipeline import (
+    EmbeddingPipeline,
+    RateLimitedEmbeddings,
+    RateLimiter,
+)
+from utils.git_utils import list_source_blobs, resolve_commit
+
+
+def run_benchmark(
+    repo_path: str,
+    limit: int,
+    concurrency: list,
+    latency: float,
+    token_latency: float,
+    requests_per_minute: int,
+    tokens_per_minute: int,
+):
+    commit = resolve_commit(repo_path)
+    blobs = list_source_blobs(repo_path, commit)
+    docs = RepositoryIngestor(repo_path, blobs=blobs).load_chunks(sorted(blobs))
+    docs = docs[:limit] if limit else docs
+    server = start_server(
+        dim=256,
+        latency=latency,
+        token_latency=token_latency,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+    )
+    provider = OpenAIEmbeddings(
+        model=config.models.embeddings_model,
+        openai_api_key="fake",
+        base_url=server.base_url,
+        max_retries=0,
+    )
+    print(f"{len(docs)} chunks of {repo_path} at {server.base_url}")
+    print(
+        f"{'mode':>14} {'seconds':>9} {'chunks/s':>9} {'requests':>9} "
+        f"{'429s':>6} {'retries':>8}"
+    )
+
+    query = provider.embed_query(docs[len(docs) // 2].page_content)
+    reference = None
+    for workers in [None] + concurrency:
+        for key in server.stats:
+            server.stats[key] = 0
+        embeddings = RateLimitedEmbeddings(
+            provider,
+            RateLimiter(requests_per_minute, tokens_per_minute),
+            max_retries=10,
+        )
+        start = time.perf_counter()
+        if workers is None:
+            vector_store = FAISS.from_documents(docs, embeddings)
+        else:
+            vector_store = EmbeddingPipeline(
+                embeddings, concurrency=workers
+            ).add_documents(docs)
+        elapsed = time.perf_counter() - start
+
+        found = [
+            doc.page_content
+            for doc, _ in vector_store.similarity_search_with_score_by_vector(
+                query, k=5
+            )
+        ]
+        reference = reference or found
+        mode = "sequential" if workers is None else f"pipeline x{workers}"
+        print(
+            f"{mode:>14} {elapsed:>9.2f} {len(docs) / elapsed:>9.1f} "
+            f"{server.stats['requests']:>9} {server.stats['rate_limited']:>6} "
+            f"{embeddings.retries:>8}"
+        )
+        assert vector_store.index.ntotal == len(docs)
+        assert np.array_equal(found, reference), "search results differ"
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding pipeline benchmark")
+    parser.add_argument("--repo", required=True, help="Path to a git checkout")
+    parser.add_argument("--limit", type=int, default=0, help="Embed only N chunks")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds")
+    parser.add_argument(
+        "--token-latency", type=float, default=0.01, help="Seconds per 1k tokens"
+    )
+    parser.add_argument("--rpm", type=int, default=None, help="Requests per minute")
+    parser.add_argument("--tpm", type=int, default=None, help="Tokens per minute")
+
+    args = parser.parse_args()
+    run_benchmark(
+        args.repo,
+        args.limit,
+        args.concurrency,
+        args.latency,
+        args.token_latency,
+        args.rpm,
+        args.tpm,
+    )
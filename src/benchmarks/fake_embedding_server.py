@@ -0,0 +1,187 @@
+"""Serve deterministic fake embeddings over an OpenAI-compatible HTTP API.
+
+Requests are answered after a fixed latency plus a latency per thousand
+tokens, and answered with 429
+once the requests or tokens of the last minute exceed the configured limits,
+so batching, concurrency and backoff can be exercised without a provider.
+Point the runner at it with ``models.embeddings_base_url``. Run from ``src/``::
+
+    python -m benchmarks.fake_embedding_server --port 8765 --rpm 3000 --tpm 1000000
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+import numpy as np
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, List, Optional, Tuple
+
+
+class FakeEmbeddingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        dim: int = 1536,
+        latency: float = 0.1,
+        token_latency: float = 0.0,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        error_rate: float = 0.0,
+    ):
+        super().__init__(address, _Handler)
+        self.dim = dim
+        self.latency = latency
+        self.token_latency = token_latency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.error_rate = error_rate
+        self.stats = {"requests": 0, "inputs": 0, "rate_limited": 0, "errors": 0}
+        self._window: Deque[Tuple[float, int]] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def admit(self, tokens: int) -> float:
+        """Record a request, returning 0 or the seconds to wait after a 429"""
+        with self._lock:
+            now = time.monotonic()
+            while self._window and self._window[0][0] <= now - 60:
+                self._window.popleft()
+            used = sum(count for _, count in self._window)
+            over_requests = (
+                self.requests_per_minute
+                and len(self._window) >= self.requests_per_minute
+            )
+            over_tokens = (
+                self.tokens_per_minute and used + tokens > self.tokens_per_minute
+            )
+            if (over_requests or over_tokens) and self._window:
+                self.stats["rate_limited"] += 1
+                return max(self._window[0][0] + 60 - now, 0.1)
+            self._window.append((now, tokens))
+            self.stats["requests"] += 1
+            return 0.0
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def embed(self, item) -> np.ndarray:
+        digest = hashlib.sha256(json.dumps(item).encode("utf-8")).digest()
+        rng = np.random.default_rng(int.from_bytes(digest[:8], "little"))
+        vector = rng.standard_normal(self.dim).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeEmbeddingServer
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/embeddings"):
+            self._reply(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        inputs = self._inputs(body["input"])
+        tokens = sum(
+            len(item) if isinstance(item, list) else len(item) // 4 + 1
+            for item in inputs
+        )
+
+        wait = self.server.admit(tokens)
+        if wait:
+            self._reply(
+                429,
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                {"retry-after": f"{wait:.2f}"},
+            )
+            return
+        if random.random() < self.server.error_rate:
+            self.server.count("errors")
+            self._reply(500, {"error": {"message": "Injected server error"}})
+            return
+
+        time.sleep(self.server.latency + self.server.token_latency * tokens / 1000)
+        self.server.count("inputs", len(inputs))
+        data = []
+        for i, item in enumerate(inputs):
+            vector = self.server.embed(item)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        self._reply(
+            200,
+            {
+                "object": "list",
+                "data": data,
+                "model": body.get("model", "fake"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            },
+        )
+
+    @staticmethod
+    def _inputs(value) -> List:
+        # A single string or token list, or a list of either
+        if isinstance(value, str) or (value and isinstance(value[0], int)):
+            return [value]
+        return list(value)
+
+    def _reply(self, status: int, payload: dict, headers: Optional[dict] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port: int = 0, **kwargs) -> FakeEmbeddingServer:
+    """Serve in a background thread; port 0 picks a free port"""
+    server = FakeEmbeddingServer(("127.0.0.1", port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI embeddings server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds")
+    parser.add_argument(
+        "--token-latency", type=float, default=0.0, help="Seconds per 1k tokens"
+    )
+    parser.add_argument("--rpm", type=int, default=None, help="Requests per minute")
+    parser.add_argument("--tpm", type=int, default=None, help="Tokens per minute")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+
+    args = parser.parse_args()
+    server = FakeEmbeddingServer(
+        ("127.0.0.1", args.port),
+        dim=args.dim,
+        latency=args.latency,
+        token_latency=args.token_latency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        error_rate=args.error_rate,
+    )
+    print(f"Serving fake embeddings at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(server.stats)
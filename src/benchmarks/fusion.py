@@ -0,0 +1,128 @@
+"""Compare result fusion against the earlier substring-count reranking.
+
+Candidate lists stand in for BM25 and vector hits over code chunks of the
+configured chunk size; the two lists share part of their documents, as real
+hybrid results do. Run from ``src/``::
+
+    python -m benchmarks.fusion --candidates 15 50 200 1000 --terms 12
+"""
+
+import argparse
+import random
+import time
+from langchain_core.documents import Document
+from config.settings import config
+from core.fusion import diversify, fuse_rankings
+
+
+def make_candidates(count: int, terms: list, rng: random.Random) -> tuple:
+    vocab = [f"{rng.choice(['get', 'set', 'load', 'parse'])}_{i}" for i in range(2000)]
+    vocab += ["def", "return", "self", "None", "if", "for", "in", "import"]
+    docs = []
+    for i in range(count * 2):
+        words, size = [], 0
+        while size < config.retrieval.chunk_size:
+            word = rng.choice(terms) if rng.random() < 0.01 else rng.choice(vocab)
+            words.append(word)
+            size += len(word) + 1
+        docs.append(
+            Document(
+                page_content=" ".join(words),
+                metadata={"source": f"pkg/module_{rng.randrange(count)}.py"},
+            )
+        )
+    # Vector hits overlap BM25 hits by about a third
+    bm25 = docs[:count]
+    vector = docs[count - count // 3 : 2 * count - count // 3]
+    rng.shuffle(vector)
+    return bm25, vector
+
+
+def substring_rank(bm25: list, vector: list, key_terms: list, top_k: int) -> list:
+    """The reranking HybridRetriever used before fusion"""
+    seen, combined = set(), []
+    for doc in bm25 + vector:
+        doc_id = f"{doc.metadata['source']}:{hash(doc.page_content)}"
+        if doc_id not in seen:
+            combined.append(doc)
+            seen.add(doc_id)
+
+    scored = [
+        (doc, sum(1 for t in key_terms if t.lower() in doc.page_content.lower()))
+        for doc in combined
+    ]
+    ranked = [doc for doc, _ in sorted(scored, key=lambda x: x[1], reverse=True)]
+
+    selected, seen_files = [], set()
+    for doc in ranked:
+        if len(selected) >= top_k:
+            break
+        if doc.metadata["source"] not in seen_files:
+            selected.append(doc)
+            seen_files.add(doc.metadata["source"])
+    for doc in ranked:
+        if len(selected) >= top_k:
+            break
+        if doc not in selected:
+            selected.append(doc)
+    return selected
+
+
+def fused_rank(bm25: list, vector: list, key_terms: list, top_k: int) -> list:
+    settings = config.retrieval
+    ranked = fuse_rankings(
+        [bm25, vector],
+        key_terms,
+        weights=[settings.bm25_weight, settings.vector_weight],
+        k=settings.rrf_k,
+        term_boost=settings.term_boost,
+    )
+    return diversify(ranked, top_k)
+
+
+def timed(rank, args: tuple, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rank(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmark(candidates: list, term_count: int, top_k: int, repeat: int):
+    rng = random.Random(0)
+    terms = [f"Model{i}.save_base" for i in range(term_count)]
+    print(f"{term_count} key terms, top {top_k}, best of {repeat}")
+    print(
+        f"{'candidates':>10} {'substring ms':>13} {'fusion ms':>10} {'speedup':>8} "
+        f"{'overlap':>8}"
+    )
+    for count in candidates:
+        bm25, vector = make_candidates(count, terms, rng)
+        args = (bm25, vector, terms, top_k)
+        before = timed(substring_rank, args, repeat)
+        after = timed(fused_rank, args, repeat)
+        overlap = len(
+            {id(d) for d in substring_rank(*args)} & {id(d) for d in fused_rank(*args)}
+        )
+        print(
+            f"{count * 2:>10} {before * 1000:>13.2f} {after * 1000:>10.2f} "
+            f"{before / after:>7.2f}x {overlap:>5}/{top_k}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Result fusion benchmark")
+    parser.add_argument(
+        "--candidates",
+        nargs="+",
+        type=int,
+        default=[15, 50, 200, 1000],
+        help="Hits per retrieval method",
+    )
+    parser.add_argument("--terms", type=int, default=12)
+    parser.add_argument("--top-k", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args()
+    run_benchmark(args.candidates, args.terms, args.top_k, args.repeat)
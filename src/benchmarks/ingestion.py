@@ -0,0 +1,53 @@
+"""Measure repository parsing and chunking throughput across worker counts.
+
+Run from ``src/``::
+
+    python -m benchmarks.ingestion --repo ../repos/django__django --workers 1 2 4 8
+"""
+
+import argparse
+import hashlib
+import time
+from core.ingestion import RepositoryIngestor
+from utils.git_utils import list_source_blobs, resolve_commit
+
+
+def run_benchmark(repo_path: str, commit: str, workers: list, repeat: int):
+    files = sorted(list_source_blobs(repo_path, resolve_commit(repo_path, commit)))
+    print(f"{len(files)} files at {commit} in {repo_path}")
+    print(
+        f"{'workers':>8} {'seconds':>9} {'files/s':>9} {'chunks/s':>10} {'speedup':>8}"
+    )
+
+    baseline, digests = None, set()
+    for count in workers:
+        elapsed = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            chunks = RepositoryIngestor(repo_path, workers=count).load_chunks(files)
+            elapsed = min(elapsed, time.perf_counter() - start)
+
+        digest = hashlib.sha256()
+        for chunk in chunks:
+            digest.update(chunk.metadata["source"].encode())
+            digest.update(chunk.page_content.encode())
+        digests.add(digest.hexdigest())
+
+        baseline = baseline or elapsed
+        print(
+            f"{count:>8} {elapsed:>9.2f} {len(files) / elapsed:>9.1f} "
+            f"{len(chunks) / elapsed:>10.1f} {baseline / elapsed:>7.2f}x"
+        )
+
+    print(f"Deterministic output across worker counts: {len(digests) == 1}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestion throughput benchmark")
+    parser.add_argument("--repo", required=True, help="Path to a git checkout")
+    parser.add_argument("--commit", default="HEAD", help="Commit to ingest")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=1)
+
+    args = parser.parse_args()
+    run_benchmark(args.repo, args.commit, args.workers, args.repeat)
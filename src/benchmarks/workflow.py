@@ -0,0 +1,315 @@
+"""Measure the workflow's own overhead end to end with the fake provider.
+
+Fixture repositories are generated as local git remotes and ``WorkflowRunner``
+processes one instance per repository and commit at each concurrency, with
+the fake LLM and embeddings of ``FakeProvider``. Every concurrency runs in a
+fresh process with empty caches, so retriever builds are cold and peak RSS is
+its own. Nothing is fetched over the network; only tiktoken's encodings must
+be cached (``TIKTOKEN_CACHE_DIR``). Run from ``src/``::
+
+    python -m benchmarks.workflow --concurrency 1 4 8 --save-baseline bench.json
+    python -m benchmarks.workflow --concurrency 1 4 8 --baseline bench.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Settings require API keys, which the fake provider never uses
+os.environ.setdefault("OPENAI_API_KEY", "offline")
+os.environ.setdefault("DEEPSEEK_API_KEY", "offline")
+
+from git import Actor, Repo
+from config.settings import config
+from core.data_models import InstanceItem
+from utils.common_utils import CommonUtils
+
+AUTHOR = Actor("Benchmark", "benchmark@example.com")
+
+# Metrics where a lower value is better; the others should not drop
+LOWER_IS_BETTER = ("seconds", "retriever_seconds", "peak_rss_mb", "overhead_ms")
+# Node overheads below a millisecond apart are noise, whatever their ratio
+MIN_OVERHEAD_CHANGE_MS = 1.0
+
+
+def _module_source(module: int, classes: int, methods: int, revision: int) -> str:
+    lines = [f'"""Fixture module {module}."""', "", "import logging", ""]
+    for c in range(classes):
+        lines += [f"class Widget{module}_{c}:", f'    """Widget {c} of {module}."""']
+        for m in range(methods):
+            lines += [
+                "",
+                f"    def method_{m}(self, value, retries={m + revision}):",
+                "        for attempt in range(retries):",
+                f"            if value % {m + 2} == attempt:",
+                f"                return self.method_{(m + 1) % methods}(value - 1)",
+                "        logging.debug('widget %s failed', value)",
+                f"        raise ValueError('method_{m} of Widget{module}_{c} failed')",
+            ]
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def make_fixture_repos(
+    root: Path, repos: int, modules: int, classes: int, methods: int
+) -> List[InstanceItem]:
+    """Create repositories of generated modules, two commits each"""
+    instances = []
+    for r in range(repos):
+        path = root / "fixtures" / f"repo{r}"
+        repo = Repo.init(path)
+        for revision in range(2):
+            files = []
+            for m in range(modules):
+                # The second commit changes a quarter of the modules
+                if revision and m % 4:
+                    continue
+                file = path / "pkg" / f"mod{m // 10}" / f"module{m}.py"
+                file.parent.mkdir(parents=True, exist_ok=True)
+                file.write_text(_module_source(m, classes, methods, revision))
+                files.append(str(file.relative_to(path)))
+            repo.index.add(files)
+            commit = repo.index.commit(
+                f"Revision {revision}", author=AUTHOR, committer=AUTHOR
+            )
+            module = (r + revision) % modules
+            instances.append(
+                InstanceItem(
+                    instance_id=f"fixtures__repo{r}-{revision}",
+                    repo=f"fixtures/repo{r}",
+                    base_commit=commit.hexsha,
+                    problem_statement=(
+                        f"Widget{module}_0.method_1 raises ValueError for negative "
+                        f"values instead of returning. Fix the error in module{module}."
+                    ),
+                )
+            )
+        repo.close()
+    return instances
+
+
+def _run_level(
+    workers: int,
+    instances: List[InstanceItem],
+    remotes: Path,
+    workdir: Path,
+    latency: float,
+    responses_path: Optional[str],
+    async_execution: bool,
+) -> Dict:
+    """Run every instance once at a concurrency, in its own process"""
+    from workflows.runner import WorkflowRunner
+
+    config.models.llm_model = "fake-llm"
+    config.models.embeddings_model = "fake-embeddings"
+    config.models.fake_latency = latency
+    config.models.fake_responses_path = responses_path
+    config.repo_remote_template = str(remotes / "{repo}")
+    config.repo_clone_path = str(workdir / "repos")
+    config.retrieval.vector_store_path = str(workdir / "faiss_index")
+    config.cache.cache_dir = str(workdir / ".cache")
+    config.cache.llm_enabled = False
+    config.evaluation.predictions_path = workdir / "results" / "predictions.json"
+    config.telemetry.enabled = True
+    config.telemetry.traces_dir = workdir / "results" / "traces"
+    config.workflow.async_execution = async_execution
+
+    runner = WorkflowRunner(max_workers=workers)
+    start = time.perf_counter()
+    runner.run_instances(instances)
+    elapsed = time.perf_counter() - start
+
+    totals = runner.telemetry.totals
+    llm_seconds: Dict[str, float] = {}
+    tokens = 0
+    for (kind, name), values in totals.items():
+        if kind == "llm":
+            llm_seconds[name] = llm_seconds.get(name, 0.0) + values["seconds"]
+            tokens += values["prompt_tokens"] + values["completion_tokens"]
+    # Time a node spends outside its LLM calls, per visit
+    overhead_ms = {
+        name: (values["seconds"] - llm_seconds.get(name, 0.0)) / values["calls"] * 1000
+        for (kind, name), values in totals.items()
+        if kind == "node"
+    }
+    retriever = totals.get(("setup", "retriever"), {})
+    return {
+        "workers": runner.max_workers,
+        "completed": len(runner.get_processed_ids()),
+        "seconds": elapsed,
+        "instances_per_hour": len(instances) / elapsed * 3600,
+        "tokens_per_second": tokens / elapsed,
+        "retriever_seconds": retriever.get("seconds", 0.0)
+        / max(retriever.get("calls", 0), 1),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "overhead_ms": overhead_ms,
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float):
+    """Return the metrics that regressed beyond the tolerance"""
+    regressions = []
+    for level, metrics in results.items():
+        reference = baseline.get(level)
+        if reference is None:
+            continue
+        pairs = [
+            (key, metrics[key], reference[key])
+            for key in (
+                "seconds",
+                "instances_per_hour",
+                "tokens_per_second",
+                "retriever_seconds",
+                "peak_rss_mb",
+            )
+        ]
+        pairs += [
+            (f"overhead_ms.{node}", value, reference["overhead_ms"][node])
+            for node, value in metrics["overhead_ms"].items()
+            if node in reference["overhead_ms"]
+        ]
+        for key, value, expected in pairs:
+            if key.startswith("overhead_ms") and (
+                abs(value - expected) < MIN_OVERHEAD_CHANGE_MS
+            ):
+                continue
+            lower_is_better = key.split(".")[0] in LOWER_IS_BETTER
+            change = (value - expected) / expected if expected else 0.0
+            if (change if lower_is_better else -change) > tolerance:
+                regressions.append(
+                    f"x{level} {key}: {expected:.2f} -> {value:.2f} ({change:+.0%})"
+                )
+    return regressions
+
+
+def run_benchmark(
+    repos: int,
+    modules: int,
+    classes: int,
+    methods: int,
+    concurrency: list,
+    latency: float,
+    responses_path: Optional[str],
+    async_execution: bool,
+    save_baseline: Optional[str],
+    baseline_path: Optional[str],
+    tolerance: float,
+) -> int:
+    try:
+        CommonUtils.get_encoder("fake-llm")
+    except Exception as e:
+        print(f"Could not load tiktoken's encoding, cache it first: {str(e)}")
+        return 2
+
+    settings = {
+        "repos": repos,
+        "modules": modules,
+        "classes": classes,
+        "methods": methods,
+        "latency": latency,
+        "responses": responses_path,
+        "async": async_execution,
+    }
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="workflow-bench-") as tmp:
+        remotes = Path(tmp) / "remotes"
+        start = time.perf_counter()
+        instances = make_fixture_repos(remotes, repos, modules, classes, methods)
+        print(
+            f"{len(instances)} instances over {repos} fixture repositories of "
+            f"{modules} modules in {time.perf_counter() - start:.2f}s, "
+            f"LLM latency {latency}s, {'async' if async_execution else 'threads'}"
+        )
+        print(
+            f"{'workers':>8} {'seconds':>9} {'inst/h':>9} {'tokens/s':>10} "
+            f"{'retriever s':>12} {'peak MB':>8}  node overhead ms"
+        )
+        for workers in concurrency:
+            # Spawned, so the process holds nothing but this level's run
+            with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+                metrics = pool.submit(
+                    _run_level,
+                    workers,
+                    instances,
+                    remotes,
+                    Path(tmp) / f"x{workers}",
+                    latency,
+                    responses_path,
+                    async_execution,
+                ).result()
+            results[str(workers)] = metrics
+            overhead = " ".join(
+                f"{node}={ms:.1f}"
+                for node, ms in sorted(metrics["overhead_ms"].items())
+            )
+            print(
+                f"{metrics['workers']:>8} {metrics['seconds']:>9.2f} "
+                f"{metrics['instances_per_hour']:>9.0f} "
+                f"{metrics['tokens_per_second']:>10.0f} "
+                f"{metrics['retriever_seconds']:>12.3f} "
+                f"{metrics['peak_rss_mb']:>8.0f}  {overhead}"
+            )
+            if metrics["completed"] != len(instances):
+                print(f"Only {metrics['completed']}/{len(instances)} completed")
+                return 1
+
+    if save_baseline:
+        Path(save_baseline).write_text(
+            json.dumps({"settings": settings, "levels": results}, indent=2)
+        )
+        print(f"Saved baseline to {save_baseline}")
+    if baseline_path:
+        baseline = json.loads(Path(baseline_path).read_text())
+        if baseline["settings"] != settings:
+            print(f"Baseline was recorded with other settings: {baseline['settings']}")
+        regressions = compare(results, baseline["levels"], tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {tolerance:.0%} against {baseline_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Workflow overhead benchmark")
+    parser.add_argument("--repos", type=int, default=4)
+    parser.add_argument("--modules", type=int, default=40, help="Modules per repo")
+    parser.add_argument("--classes", type=int, default=3, help="Classes per module")
+    parser.add_argument("--methods", type=int, default=8, help="Methods per class")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds per LLM or embedding call"
+    )
+    parser.add_argument("--responses", default=None, help="JSONL of fake responses")
+    parser.add_argument("--async", dest="async_execution", action="store_true")
+    parser.add_argument("--save-baseline", default=None, help="Write results here")
+    parser.add_argument("--baseline", default=None, help="Compare with these results")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="Allowed relative regression"
+    )
+
+    args = parser.parse_args()
+    sys.exit(
+        run_benchmark(
+            args.repos,
+            args.modules,
+            args.classes,
+            args.methods,
+            args.concurrency,
+            args.latency,
+            args.responses,
+            args.async_execution,
+            args.save_baseline,
+            args.baseline,
+            args.tolerance,
+        )
+    )
@@ -1,6 +1,8 @@
+import os
 from pydantic import BaseModel, Field, model_validator, SecretStr
 from pathlib import Path
 from enum import Enum
+from typing import Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -14,6 +16,17 @@ class ModelSettings(BaseModel):
     llm_model: str = Field(default="gpt-4-turbo")
     temperature: float = Field(default=0.0)
     deepseek_base_url: str = Field(default="https://api.deepseek.com/v1")
+    requests_per_second: Optional[float] = Field(default=None)
+    embeddings_base_url: Optional[str] = Field(default=None)
+    embedding_batch_tokens: int = Field(default=50_000)
+    embedding_batch_size: int = Field(default=256)
+    embedding_concurrency: int = Field(default=4)
+    embedding_requests_per_minute: Optional[int] = Field(default=None)
+    embedding_tokens_per_minute: Optional[int] = Field(default=None)
+    embedding_max_retries: int = Field(default=6)
+    fake_latency: float = Field(default=0.0)
+    fake_responses_path: Optional[str] = Field(default=None)
+    fake_embedding_size: int = Field(default=256)
 
 
 class RetrievalSettings(BaseModel):
@@ -21,7 +34,27 @@ class RetrievalSettings(BaseModel):
     chunk_overlap: int = Field(default=300)
     parser_threshold: int = Field(default=500)
     relevant_extensions: tuple = Field(default=FileExtensions.RELEVANT.value)
+    exclude_patterns: tuple = Field(default=("**/test_*.py", "**/tests/*.py"))
     vector_store_path: str = Field(default="faiss_index")
+    index_reuse_candidates: int = Field(default=3)
+    bm25_top_k: int = Field(default=15)
+    rrf_k: int = Field(default=60)
+    bm25_weight: float = Field(default=1.0)
+    vector_weight: float = Field(default=1.0)
+    term_boost: float = Field(default=0.5)
+    key_term_extractor: str = Field(default="local")
+    max_key_terms: int = Field(default=20)
+    symbol_weight: float = Field(default=2.0)
+    max_symbol_definitions: int = Field(default=3)
+    max_symbol_callers: int = Field(default=5)
+    max_pinned_chunks: int = Field(default=5)
+    # Processes per retriever build; concurrent instances each start their own
+    # pool, so a cold run can spawn up to evaluation.max_workers times this many
+    ingestion_workers: int = Field(default_factory=lambda: min(4, os.cpu_count() or 1))
+    ingestion_batch_size: int = Field(default=32)
+    # "git" reads source blobs from the repository's bare mirror; "filesystem"
+    # reads a checked out worktree, which only it takes from the worktree pool
+    ingestion_backend: str = Field(default="git")
 
 
 class WorkflowSettings(BaseModel):
@@ -30,8 +63,10 @@ class WorkflowSettings(BaseModel):
     max_analysis_attempts: int = Field(default=3)
     max_review_attempts: int = Field(default=3)
     max_files_per_patch: int = Field(default=20)
+    editor_context_tokens: int = Field(default=3000)
     recursion_additional_limit: int = Field(default=50)
-    thread_id: int = Field(default=1)
+    max_history_entries: int = Field(default=3)
+    async_execution: bool = Field(default=False)
 
 
 class EvaluationSettings(BaseModel):
@@ -41,14 +76,34 @@ class EvaluationSettings(BaseModel):
     timeout: int = Field(default=1800)
 
 
+class CacheSettings(BaseModel):
+    cache_dir: str = Field(default=".cache")
+    embeddings_enabled: bool = Field(default=True)
+    llm_enabled: bool = Field(default=True)
+    checkpoints_enabled: bool = Field(default=True)
+    llm_max_bytes: int = Field(default=512 * 1024 * 1024)
+    token_memo_max_tokens: int = Field(default=4_000_000)
+
+
+class TelemetrySettings(BaseModel):
+    enabled: bool = Field(default=True)
+    traces_dir: Path = Field(default=Path("results/traces"))
+    otlp_endpoint: Optional[str] = Field(default=None)
+
+
 class Settings(BaseSettings):
     models: ModelSettings = ModelSettings()
     retrieval: RetrievalSettings = RetrievalSettings()
     workflow: WorkflowSettings = WorkflowSettings()
     evaluation: EvaluationSettings = EvaluationSettings()
+    cache: CacheSettings = CacheSettings()
+    telemetry: TelemetrySettings = TelemetrySettings()
     openai_api_key: SecretStr
     deepseek_api_key: SecretStr
     repo_clone_path: str = Field(default="repos")
+    repo_remote_template: str = Field(default="https://github.com/{repo}.git")
+    # Idle worktrees kept for the filesystem ingestion backend
+    max_worktrees: int = Field(default=8)
 
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", extra="ignore"
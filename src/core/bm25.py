@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import re
+import uuid
+import numpy as np
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from utils.file_lock import file_lock
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index stored as CSR postings arrays.
+
+    Terms are addressed by 64-bit hashes kept in a sorted array, so the whole
+    index is a handful of NumPy arrays that load memory-mapped. Scoring only
+    touches the postings of the query terms.
+    """
+
+    TOKEN_PATTERN = re.compile(r"\w+")
+    META_FILE = "meta.json"
+    LOCK_FILE = ".lock"
+    ARRAYS = ("term_hashes", "idf", "indptr", "postings", "term_freqs", "doc_norms")
+
+    def __init__(
+        self,
+        term_hashes: np.ndarray,
+        idf: np.ndarray,
+        indptr: np.ndarray,
+        postings: np.ndarray,
+        term_freqs: np.ndarray,
+        doc_norms: np.ndarray,
+        k1: float,
+    ):
+        self.term_hashes = term_hashes
+        self.idf = idf
+        self.indptr = indptr
+        self.postings = postings
+        self.term_freqs = term_freqs
+        self.doc_norms = doc_norms
+        self.k1 = k1
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_norms)
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        return cls.TOKEN_PATTERN.findall(text.lower())
+
+    @staticmethod
+    def hash_term(term: str) -> int:
+        digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little")
+
+    @classmethod
+    def build(
+        cls, texts: Iterable[str], k1: float = 1.5, b: float = 0.75
+    ) -> "BM25Index":
+        """Build the index from chunk texts in document order"""
+        vocabulary: Dict[str, int] = {}
+        term_ids, doc_ids, term_freqs, doc_lengths = [], [], [], []
+        for doc_id, text in enumerate(texts):
+            tokens = cls.tokenize(text)
+            doc_lengths.append(len(tokens))
+            counts = Counter(tokens)
+            term_ids.extend(
+                vocabulary.setdefault(term, len(vocabulary)) for term in counts
+            )
+            doc_ids.extend([doc_id] * len(counts))
+            term_freqs.extend(counts.values())
+
+        num_docs = len(doc_lengths)
+        hashes = np.fromiter(
+            (cls.hash_term(term) for term in vocabulary),
+            dtype=np.uint64,
+            count=len(vocabulary),
+        )
+        # Renumber terms by hash so lookups can binary search the hash array
+        order = np.argsort(hashes)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        term_ids = rank[np.array(term_ids, dtype=np.int64)]
+        sort = np.argsort(term_ids, kind="stable")
+
+        term_hashes = hashes[order]
+        indptr = np.zeros(len(term_hashes) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(term_ids, minlength=len(term_hashes)))
+        doc_ids = np.array(doc_ids, dtype=np.int32)[sort]
+        term_freqs = np.array(term_freqs, dtype=np.float32)[sort]
+
+        doc_freqs = np.diff(indptr).astype(np.float64)
+        idf = np.log1p((num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+        lengths = np.array(doc_lengths, dtype=np.float64)
+        avg_length = lengths.mean() if num_docs else 0.0
+        doc_norms = k1 * (1 - b + b * lengths / max(avg_length, 1e-9))
+
+        return cls(
+            term_hashes,
+            idf.astype(np.float32),
+            indptr,
+            doc_ids,
+            term_freqs,
+            doc_norms.astype(np.float32),
+            k1,
+        )
+
+    def has_terms(self, terms: List[str]) -> List[bool]:
+        """Whether each token occurs anywhere in the indexed documents"""
+        if not terms or not len(self.term_hashes):
+            return [False] * len(terms)
+        hashes = np.fromiter(
+            (self.hash_term(term.lower()) for term in terms),
+            dtype=np.uint64,
+            count=len(terms),
+        )
+        term_ids = np.searchsorted(self.term_hashes, hashes)
+        term_ids = np.minimum(term_ids, len(self.term_hashes) - 1)
+        return (self.term_hashes[term_ids] == hashes).tolist()
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Return (doc_id, score) pairs of the top k documents"""
+        counts = Counter(self.hash_term(term) for term in self.tokenize(query))
+        if not counts or not len(self.term_hashes):
+            return []
+
+        hashes = np.fromiter(counts.keys(), dtype=np.uint64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        term_ids = np.searchsorted(self.term_hashes, hashes)
+        term_ids = np.minimum(term_ids, len(self.term_hashes) - 1)
+        found = self.term_hashes[term_ids] == hashes
+
+        doc_parts, score_parts = [], []
+        for term_id, weight in zip(term_ids[found], weights[found]):
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs = np.asarray(self.postings[start:end])
+            tf = np.asarray(self.term_freqs[start:end])
+            doc_parts.append(docs)
+            score_parts.append(
+                weight
+                * self.idf[term_id]
+                * tf
+                * (self.k1 + 1)
+                / (tf + self.doc_norms[docs])
+            )
+        if not doc_parts:
+            return []
+
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        top = min(k, len(docs))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(docs[i]), float(scores[i])) for i in best]
+
+    def save(self, path: Path):
+        """Write arrays under a new version, then switch metadata to it.
+
+        Readers resolve array files through ``meta.json``, which is replaced
+        atomically, so a concurrent load sees either the old or the new index
+        and never a mix. The swap and the removal of the replaced version's
+        arrays happen under the directory's lock, so concurrent savers each
+        remove exactly the version they replaced.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        version = uuid.uuid4().hex
+        tmp_meta = path / f".tmp-{version}-{self.META_FILE}"
+        swapped = False
+        try:
+            for name in self.ARRAYS:
+                np.save(path / self._array_file(name, version), getattr(self, name))
+            with open(tmp_meta, "w") as f:
+                json.dump(
+                    {"k1": self.k1, "num_docs": self.num_docs, "version": version}, f
+                )
+            with file_lock(path / self.LOCK_FILE):
+                replaced = self._current_version(path)
+                os.replace(tmp_meta, path / self.META_FILE)
+                swapped = True
+                if replaced:
+                    self._remove_arrays(path, replaced)
+        except OSError as e:
+            logger.warning(f"Could not save BM25 index to {path}: {str(e)}")
+            if not swapped:
+                self._remove_arrays(path, version)
+                tmp_meta.unlink(missing_ok=True)
+
+    @staticmethod
+    def _array_file(name: str, version: str) -> str:
+        return f"{name}.{version}.npy"
+
+    @classmethod
+    def _remove_arrays(cls, path: Path, version: str):
+        for name in cls.ARRAYS:
+            (path / cls._array_file(name, version)).unlink(missing_ok=True)
+
+    @classmethod
+    def _read_meta(cls, path: Path) -> Optional[dict]:
+        if not (path / cls.META_FILE).exists():
+            return None
+        with open(path / cls.META_FILE, "r") as f:
+            return json.load(f)
+
+    @classmethod
+    def _current_version(cls, path: Path) -> Optional[str]:
+        try:
+            meta = cls._read_meta(path)
+        except (OSError, ValueError):
+            return None
+        return meta.get("version") if meta else None
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["BM25Index"]:
+        """Memory-map a saved index, or return None if it is missing"""
+        path = Path(path)
+        if not (path / cls.META_FILE).exists():
+            return None
+        try:
+            # Saves remove replaced arrays under the lock; mapped ones survive
+            with file_lock(path / cls.LOCK_FILE, shared=True):
+                meta = cls._read_meta(path)
+                arrays = {
+                    name: np.load(
+                        path / cls._array_file(name, meta["version"]), mmap_mode="r"
+                    )
+                    for name in cls.ARRAYS
+                }
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable BM25 index at {path}: {str(e)}")
+            return None
+        if len(arrays["doc_norms"]) != meta["num_docs"]:
+            return None
+        return cls(k1=meta["k1"], **arrays)
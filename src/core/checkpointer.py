@@ -0,0 +1,326 @@
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from config.settings import config
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver[int]):
+    """Durable LangGraph checkpoint saver backed by a local SQLite database.
+
+    Channel values are stored once per channel version, so a checkpoint only
+    writes the channels its step changed. Threads are keyed by instance id
+    and the database runs in WAL mode, so worker threads and runner processes
+    can checkpoint concurrently and an interrupted instance can be resumed.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        super().__init__()
+        self.path = Path(path or Path(config.cache.cache_dir) / "checkpoints.sqlite")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints (thread_id TEXT NOT NULL, "
+            "checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+            "parent_id TEXT, type TEXT NOT NULL, checkpoint BLOB NOT NULL, "
+            "metadata_type TEXT NOT NULL, metadata BLOB NOT NULL, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs (thread_id TEXT NOT NULL, "
+            "checkpoint_ns TEXT NOT NULL, channel TEXT NOT NULL, "
+            "version TEXT NOT NULL, type TEXT NOT NULL, value BLOB, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, channel, version))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS writes (thread_id TEXT NOT NULL, "
+            "checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+            "task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, "
+            "type TEXT NOT NULL, value BLOB, task_path TEXT NOT NULL, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Load the requested checkpoint, or the thread's latest one"""
+        return next(self.list(config, limit=1), None)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """Yield matching checkpoints, newest first"""
+        clauses, params = [], []
+        if config:
+            configurable = config["configurable"]
+            clauses.append("thread_id = ?")
+            params.append(str(configurable["thread_id"]))
+            if configurable.get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(configurable["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # Metadata filters run in Python, so only unfiltered queries can limit
+        order = "ORDER BY checkpoint_id DESC"
+        if limit is not None and not filter:
+            order += " LIMIT ?"
+            params.append(limit)
+        cursor = self._connection().execute(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, "
+            f"checkpoint, metadata_type, metadata FROM checkpoints {where} {order}",
+            params,
+        )
+
+        try:
+            for row in cursor:
+                if limit is not None and limit <= 0:
+                    break
+                metadata = self.serde.loads_typed((row[6], row[7]))
+                if filter and any(metadata.get(k) != v for k, v in filter.items()):
+                    continue
+                if limit is not None:
+                    limit -= 1
+                yield self._load_tuple(row, metadata)
+        finally:
+            cursor.close()
+
+    def _load_tuple(self, row: tuple, metadata: CheckpointMetadata) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id = row[:4]
+        checkpoint = self.serde.loads_typed((row[4], row[5]))
+        checkpoint["channel_values"] = self._load_blobs(
+            thread_id, checkpoint_ns, checkpoint["channel_versions"]
+        )
+        writes = (
+            self._connection()
+            .execute(
+                "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? "
+                "AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+            .fetchall()
+        )
+        return CheckpointTuple(
+            config=self._config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint=checkpoint,
+            metadata=metadata,
+            parent_config=(
+                self._config(thread_id, checkpoint_ns, parent_id) if parent_id else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((type_, value)))
+                for task_id, channel, type_, value in writes
+            ],
+        )
+
+    def _load_blobs(
+        self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions
+    ) -> Dict[str, Any]:
+        if not versions:
+            return {}
+        keys = [(channel, str(version)) for channel, version in versions.items()]
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT channel, type, value FROM blobs WHERE thread_id = ? AND "
+                "checkpoint_ns = ? AND (channel, version) IN "
+                f"(VALUES {', '.join('(?, ?)' for _ in keys)})",
+                [thread_id, checkpoint_ns, *(part for key in keys for part in key)],
+            )
+            .fetchall()
+        )
+        return {
+            channel: self.serde.loads_typed((type_, value))
+            for channel, type_, value in rows
+            if type_ != "empty"
+        }
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Store a checkpoint and the channel values that changed in it"""
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint = checkpoint.copy()
+        values = checkpoint.pop("channel_values")
+        blobs = [
+            (
+                thread_id,
+                checkpoint_ns,
+                channel,
+                str(version),
+                *(
+                    self.serde.dumps_typed(values[channel])
+                    if channel in values
+                    else ("empty", None)
+                ),
+            )
+            for channel, version in new_versions.items()
+        ]
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, "
+                "version, type, value) VALUES (?, ?, ?, ?, ?, ?)",
+                blobs,
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, "
+                "checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    *self.serde.dumps_typed(checkpoint),
+                    *self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+                ),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self._config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ):
+        """Store a task's pending writes for the checkpoint it ran from"""
+        configurable = config["configurable"]
+        # Special writes replace earlier ones, regular writes are only kept once
+        verb = (
+            "INSERT OR REPLACE"
+            if all(channel in WRITES_IDX_MAP for channel, _ in writes)
+            else "INSERT OR IGNORE"
+        )
+        self._connection().executemany(
+            f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, "
+            "idx, channel, type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    str(configurable["thread_id"]),
+                    configurable.get("checkpoint_ns", ""),
+                    configurable["checkpoint_id"],
+                    task_id,
+                    WRITES_IDX_MAP.get(channel, idx),
+                    channel,
+                    *self.serde.dumps_typed(value),
+                    task_path,
+                )
+                for idx, (channel, value) in enumerate(writes)
+            ],
+        )
+
+    def delete_thread(self, thread_id: str):
+        """Drop every checkpoint of a finished thread"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ("checkpoints", "blobs", "writes"):
+                conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ?", (str(thread_id),)
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def thread_ids(self) -> List[str]:
+        """Threads with checkpoints left behind by interrupted runs"""
+        rows = self._connection().execute(
+            "SELECT DISTINCT thread_id FROM checkpoints ORDER BY thread_id"
+        )
+        return [thread_id for (thread_id,) in rows]
+
+    # SQLite calls are short and blocking, so they run on worker threads
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ):
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str):
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    @staticmethod
+    def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> dict:
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+            }
+        }
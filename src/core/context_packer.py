@@ -0,0 +1,225 @@
+from collections import OrderedDict
+from pydantic import BaseModel
+from langchain_core.documents import Document
+from config.settings import config
+from core.spans import coalesce_spans, has_span, span_header
+from utils.common_utils import CommonUtils
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PackingReport(BaseModel):
+    budget: int
+    used: int = 0
+    candidates: int = 0
+    selected: int = 0
+    dropped: int = 0
+    merged: int = 0
+    truncated: bool = False
+    overlap_tokens_saved: int = 0
+
+
+class _Item(BaseModel):
+    source: str
+    header: str
+    text: str
+    tokens: int
+    value: float
+    order: int
+    start_line: Optional[int] = None
+
+
+class ContextPacker:
+    """Packs ranked chunks into a token budget.
+
+    Duplicate chunks are dropped and overlapping chunks of the same file are
+    coalesced, by their line spans or else by matching text, then a 0/1
+    knapsack over quantized token weights picks the most valuable set that
+    fits. Leftover budget goes to a truncated copy of the best chunk that did
+    not fit.
+    """
+
+    QUANTA = 1000
+    MIN_OVERLAP = 20
+    MIN_FILL_TOKENS = 64
+
+    def __init__(self, budget: int):
+        self.budget = max(budget, 0)
+
+    def pack(self, docs: List[Document]) -> Tuple[str, PackingReport]:
+        """Return the packed context and a report of how the budget was spent"""
+        report = PackingReport(budget=self.budget, candidates=len(docs))
+        unique = {(d.metadata.get("source"), d.page_content): d for d in docs}
+        spans = coalesce_spans(docs)
+        report.merged = len(unique) - len(spans)
+        report.overlap_tokens_saved = sum(map(self._tokens, unique.values())) - sum(
+            map(self._tokens, spans)
+        )
+        items = self._merge_overlaps(self._to_items(spans), report)
+        header_tokens = [CommonUtils.calculate_tokens(item.header) for item in items]
+        # Each section also costs its header and a separating newline
+        weights = [
+            item.tokens + header + 1 for item, header in zip(items, header_tokens)
+        ]
+
+        chosen = self._knapsack(weights, [item.value for item in items])
+        used = sum(weights[i] for i in chosen)
+        sections = [(items[i], items[i].text) for i in chosen]
+
+        chosen_set = set(chosen)
+        rest = [i for i in range(len(items)) if i not in chosen_set]
+        if rest and self.budget - used >= self.MIN_FILL_TOKENS:
+            best = max(rest, key=lambda i: items[i].value)
+            room = self.budget - used - header_tokens[best] - 1
+            text, tokens = self._truncate(items[best].text, room)
+            if tokens:
+                sections.append((items[best], text))
+                used += header_tokens[best] + tokens + 1
+                report.truncated = True
+
+        report.used = used
+        report.selected = len(sections)
+        report.dropped = len(items) - len(sections)
+        return self._render(sections), report
+
+    @staticmethod
+    def _truncate(text: str, room: int) -> Tuple[str, int]:
+        """Cut text to fit room tokens with its ellipsis, and its token count"""
+        encoded = CommonUtils.encode(text)
+        limit = room - 1
+        while limit > 0:
+            truncated = CommonUtils.truncate_tokens(encoded, limit).rstrip() + "..."
+            # Tokens can merge across the cut, so measure the appended text
+            tokens = CommonUtils.calculate_tokens(truncated)
+            if tokens <= room:
+                return truncated, tokens
+            limit -= tokens - room
+        return "", 0
+
+    def _to_items(self, docs: List[Document]) -> List[_Item]:
+        items = []
+        for rank, doc in enumerate(docs):
+            # Retrieval order is the relevance signal, decaying with rank
+            items.append(
+                _Item(
+                    source=doc.metadata.get("source", "unknown"),
+                    header=span_header(doc),
+                    text=doc.page_content,
+                    tokens=self._tokens(doc),
+                    value=1.0 / (rank + 1),
+                    order=rank,
+                    start_line=doc.metadata.get("start_line")
+                    if has_span(doc)
+                    else None,
+                )
+            )
+        return items
+
+    @staticmethod
+    def _tokens(doc: Document) -> int:
+        count = doc.metadata.get("token_count")
+        if count is None:
+            count = CommonUtils.calculate_tokens(doc.page_content)
+        return count
+
+    def _merge_overlaps(self, items: List[_Item], report: PackingReport) -> List[_Item]:
+        """Stitch chunks without spans that overlap or contain each other"""
+        by_source: Dict[str, List[_Item]] = OrderedDict()
+        merged_items = []
+        for item in items:
+            if item.start_line is None:
+                by_source.setdefault(item.source, []).append(item)
+            else:
+                merged_items.append(item)
+
+        for group in by_source.values():
+            pending = list(group)
+            while pending:
+                current = pending.pop(0)
+                changed = True
+                while changed:
+                    changed = False
+                    for other in pending:
+                        text = self._stitch(current.text, other.text)
+                        if text is None:
+                            continue
+                        tokens = CommonUtils.calculate_tokens(text)
+                        report.merged += 1
+                        report.overlap_tokens_saved += (
+                            current.tokens + other.tokens - tokens
+                        )
+                        current = _Item(
+                            source=current.source,
+                            header=current.header,
+                            text=text,
+                            tokens=tokens,
+                            value=current.value + other.value,
+                            order=min(current.order, other.order),
+                        )
+                        pending.remove(other)
+                        changed = True
+                        break
+                merged_items.append(current)
+        return sorted(merged_items, key=lambda item: item.order)
+
+    def _stitch(self, first: str, second: str) -> Optional[str]:
+        """Join two chunks if one contains the other or their ends overlap"""
+        if second in first:
+            return first
+        if first in second:
+            return second
+        max_overlap = config.retrieval.chunk_overlap
+        for a, b in ((first, second), (second, first)):
+            for size in range(
+                min(len(a), len(b), max_overlap), self.MIN_OVERLAP - 1, -1
+            ):
+                if a.endswith(b[:size]):
+                    return a + b[size:]
+        return None
+
+    def _knapsack(self, weights: List[int], values: List[float]) -> List[int]:
+        """Indices of the most valuable items whose weights fit the budget"""
+        if sum(weights) <= self.budget:
+            return list(range(len(weights)))
+
+        # Rounding weights up keeps every chosen set within the true budget
+        quantum = max(1, -(-self.budget // self.QUANTA))
+        capacity = self.budget // quantum
+        units = [-(-weight // quantum) for weight in weights]
+
+        best = [0.0] * (capacity + 1)
+        keep = []
+        for unit, value in zip(units, values):
+            taken = [False] * (capacity + 1)
+            for c in range(capacity, unit - 1, -1):
+                if best[c - unit] + value > best[c]:
+                    best[c] = best[c - unit] + value
+                    taken[c] = True
+            keep.append(taken)
+
+        chosen, c = [], capacity
+        for i in range(len(weights) - 1, -1, -1):
+            if keep[i][c]:
+                chosen.append(i)
+                c -= units[i]
+        return sorted(chosen)
+
+    def _render(self, sections: List[Tuple[_Item, str]]) -> str:
+        """Group sections by file in rank order, each file's spans by line"""
+        files: Dict[str, List[Tuple[_Item, str]]] = OrderedDict()
+        for item, text in sorted(sections, key=lambda section: section[0].order):
+            files.setdefault(item.source, []).append((item, text))
+        return "\n".join(
+            item.header + text
+            for parts in files.values()
+            for item, text in sorted(
+                parts,
+                key=lambda part: (
+                    part[0].start_line is None,
+                    part[0].start_line or 0,
+                    part[0].order,
+                ),
+            )
+        )
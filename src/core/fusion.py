@@ -0,0 +1,129 @@
+import re
+from langchain_core.documents import Document
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+
+class TermMatcher:
+    """Finds which of a set of terms occur in a text, ignoring case.
+
+    All terms are compiled into one alternation, longest first, and matched
+    against the lowercased text in a single scan. A matched term also accounts
+    for the shorter terms it contains. Terms that could start inside another
+    term's match and run past it are the only ones checked separately, which
+    keeps the result identical to testing every term as a substring.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms = sorted(
+            {term.lower() for term in terms if term.strip()},
+            key=lambda term: (-len(term), term),
+        )
+        self._pattern: Optional[re.Pattern] = None
+        self._contained: Dict[str, Set[str]] = {}
+        self._straddling: List[str] = []
+        if self.terms:
+            self._pattern = re.compile("|".join(map(re.escape, self.terms)))
+            self._contained = {
+                term: {other for other in self.terms if other in term}
+                for term in self.terms
+            }
+            prefixes: Dict[str, Set[str]] = {}
+            for term in self.terms:
+                for size in range(1, len(term)):
+                    prefixes.setdefault(term[:size], set()).add(term)
+            straddling: Set[str] = set()
+            for other in self.terms:
+                for start in range(1, len(other)):
+                    straddling |= prefixes.get(other[start:], set())
+            self._straddling = sorted(straddling)
+
+    def matches(self, text: str) -> Set[str]:
+        """Return the terms that occur in text"""
+        found: Set[str] = set()
+        if self._pattern is None:
+            return found
+        text = text.lower()
+        for match in set(self._pattern.findall(text)):
+            found |= self._contained[match]
+        for term in self._straddling:
+            if term not in found and term in text:
+                found.add(term)
+        return found
+
+    def count(self, text: str) -> int:
+        return len(self.matches(text))
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Document]],
+    weights: Optional[Sequence[float]] = None,
+    k: int = 60,
+) -> Dict[int, float]:
+    """Score documents by the weighted sum of 1 / (k + rank) over rankings.
+
+    Documents are keyed by identity, so every ranking must hold the same
+    objects for the same chunk.
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc in enumerate(ranking, start=1):
+            scores[id(doc)] = scores.get(id(doc), 0.0) + weight / (k + rank)
+    return scores
+
+
+def fuse_rankings(
+    rankings: Sequence[Sequence[Document]],
+    key_terms: Iterable[str],
+    weights: Optional[Sequence[float]] = None,
+    k: int = 60,
+    term_boost: float = 0.0,
+) -> List[Document]:
+    """Order the union of rankings by fused rank, boosted by key term matches"""
+    scores = reciprocal_rank_fusion(rankings, weights, k)
+    docs: Dict[int, Document] = {}
+    for ranking in rankings:
+        for doc in ranking:
+            docs.setdefault(id(doc), doc)
+
+    matcher = TermMatcher(key_terms)
+    if term_boost and matcher.terms:
+        for doc_id, doc in docs.items():
+            scores[doc_id] *= 1.0 + term_boost * matcher.count(doc.page_content)
+
+    # Ties keep first-seen order since the sort is stable
+    return sorted(docs.values(), key=lambda doc: scores[id(doc)], reverse=True)
+
+
+def unique_docs(docs: Iterable[Document]) -> List[Document]:
+    """Drop repeated documents, keeping first occurrences"""
+    seen: Set[int] = set()
+    unique = []
+    for doc in docs:
+        if id(doc) not in seen:
+            seen.add(id(doc))
+            unique.append(doc)
+    return unique
+
+
+def diversify(docs: List[Document], top_k: int) -> List[Document]:
+    """Take the best chunk of each file first, then fill by rank"""
+    selected: List[Document] = []
+    selected_ids: Set[int] = set()
+    seen_files: Set[str] = set()
+    for doc in docs:
+        if len(selected) >= top_k:
+            break
+        source = doc.metadata.get("source")
+        if source not in seen_files:
+            seen_files.add(source)
+            selected.append(doc)
+            selected_ids.add(id(doc))
+
+    for doc in docs:
+        if len(selected) >= top_k:
+            break
+        if id(doc) not in selected_ids:
+            selected.append(doc)
+            selected_ids.add(id(doc))
+    return selected
@@ -0,0 +1,217 @@
+import json
+import os
+import uuid
+from pathlib import Path
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+from config.settings import config
+from core.providers.embedding_pipeline import EmbeddingPipeline
+from utils.file_lock import file_lock
+from utils.git_utils import commit_timestamps
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+ChunkLoader = Callable[[List[str]], List[Document]]
+
+
+class IndexStore:
+    """Commit-keyed FAISS indexes with incremental builds between commits.
+
+    Each save writes its FAISS files under a new version and then replaces
+    the commit's manifest, which names the version, so loads never pair the
+    vectors of one save with the docstore of another.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+    LOCK_FILE = ".index.lock"
+
+    def __init__(self, repo_name: str, repo_path: str, embeddings: Embeddings):
+        self.repo_path = repo_path
+        self.embeddings = embeddings
+        self.root = Path(config.retrieval.vector_store_path) / repo_name
+
+    def commit_path(self, commit: str) -> Path:
+        return self.root / commit
+
+    def load_or_build(
+        self, commit: str, file_hashes: Dict[str, str], load_chunks: ChunkLoader
+    ) -> FAISS:
+        """Load the index for a commit, deriving it from the nearest one if missing"""
+        path = self.commit_path(commit)
+        if (path / self.MANIFEST_FILE).exists():
+            try:
+                vector_store, _ = self._load_index(path)
+                logger.info(f"Loaded existing FAISS index from {path}")
+                return vector_store
+            except Exception as e:
+                logger.warning(f"Discarding unreadable index at {path}: {str(e)}")
+
+        base = self.find_nearest_commit(commit, file_hashes)
+        if base:
+            vector_store, manifest = self._update_index(base, file_hashes, load_chunks)
+        else:
+            logger.info(f"Creating new vector store in {path}")
+            vector_store, manifest = self._build_index(file_hashes, load_chunks)
+
+        self._save(path, vector_store, manifest)
+        return vector_store
+
+    def _build_index(
+        self, file_hashes: Dict[str, str], load_chunks: ChunkLoader
+    ) -> Tuple[FAISS, Dict[str, dict]]:
+        """Embed every chunk of the repository"""
+        docs = load_chunks(sorted(file_hashes))
+        ids, manifest = self._assign_ids(docs, file_hashes)
+        vector_store = EmbeddingPipeline(self.embeddings).add_documents(docs, ids)
+        return vector_store, manifest
+
+    def _update_index(
+        self, base: str, file_hashes: Dict[str, str], load_chunks: ChunkLoader
+    ) -> Tuple[FAISS, Dict[str, dict]]:
+        """Re-embed only the files whose blobs differ from the base commit"""
+        vector_store, base_manifest = self._load_index(self.commit_path(base))
+
+        changed = set(
+            path
+            for path, blob in file_hashes.items()
+            if base_manifest.get(path, {}).get("blob") != blob
+        )
+        stale_ids = [
+            chunk_id
+            for path, entry in base_manifest.items()
+            if path not in file_hashes or path in changed
+            for chunk_id in entry["ids"]
+        ]
+        logger.info(
+            f"Updating index from {base}: {len(changed)} changed files, "
+            f"{len(stale_ids)} stale chunks"
+        )
+
+        if stale_ids:
+            vector_store.delete(stale_ids)
+
+        docs = load_chunks(sorted(changed))
+        ids, changed_manifest = self._assign_ids(
+            docs, {p: file_hashes[p] for p in changed}
+        )
+        if docs:
+            EmbeddingPipeline(self.embeddings).add_documents(docs, ids, vector_store)
+
+        manifest = {
+            path: entry
+            for path, entry in base_manifest.items()
+            if path in file_hashes and path not in changed_manifest
+        }
+        manifest.update(changed_manifest)
+        return vector_store, manifest
+
+    def _assign_ids(
+        self, docs: List[Document], file_hashes: Dict[str, str]
+    ) -> Tuple[List[str], Dict[str, dict]]:
+        """Give chunks stable ids derived from their file path and blob"""
+        manifest = {
+            path: {"blob": blob, "ids": []} for path, blob in file_hashes.items()
+        }
+        ids = []
+        for doc in docs:
+            entry = manifest[doc.metadata["source"]]
+            chunk_id = f"{doc.metadata['source']}@{entry['blob']}:{len(entry['ids'])}"
+            entry["ids"].append(chunk_id)
+            ids.append(chunk_id)
+        return ids, manifest
+
+    def find_nearest_commit(
+        self, commit: str, file_hashes: Dict[str, str]
+    ) -> Optional[str]:
+        """Pick the indexed commit sharing the most file blobs with this one"""
+        indexed = [
+            manifest_path.parent.name
+            for manifest_path in self.root.glob(f"*/{self.MANIFEST_FILE}")
+            if manifest_path.parent.name != commit
+            and not manifest_path.parent.name.startswith(".")
+        ]
+        if not indexed:
+            return None
+
+        # Only diff manifests of the commits closest in time
+        timestamps = commit_timestamps(self.repo_path, indexed + [commit])
+        target = timestamps.get(commit, 0)
+        candidates = sorted(
+            (c for c in indexed if c in timestamps),
+            key=lambda c: abs(timestamps[c] - target),
+        )[: config.retrieval.index_reuse_candidates]
+
+        best, best_shared = None, 0
+        for candidate in candidates:
+            try:
+                manifest = self.read_manifest(candidate)
+            except Exception as e:
+                logger.warning(f"Skipping manifest of {candidate}: {str(e)}")
+                continue
+            shared = sum(
+                1
+                for path, entry in manifest.items()
+                if file_hashes.get(path) == entry["blob"]
+            )
+            if shared > best_shared:
+                best, best_shared = candidate, shared
+        return best
+
+    def _load_index(self, path: Path) -> Tuple[FAISS, Dict[str, dict]]:
+        """Load the saved version of an index together with its manifest"""
+        # Saves remove replaced versions under the lock, never during a load
+        with file_lock(path / self.LOCK_FILE, shared=True):
+            with open(path / self.MANIFEST_FILE, "r") as f:
+                manifest = json.load(f)
+            vector_store = FAISS.load_local(
+                folder_path=str(path),
+                embeddings=self.embeddings,
+                index_name=self._index_name(manifest["version"]),
+                allow_dangerous_deserialization=True,
+            )
+        return vector_store, manifest["files"]
+
+    @staticmethod
+    def _index_name(version: str) -> str:
+        return f"index.{version}"
+
+    def read_manifest(self, commit: str) -> Dict[str, dict]:
+        with open(self.commit_path(commit) / self.MANIFEST_FILE, "r") as f:
+            return json.load(f)["files"]
+
+    def _save(self, path: Path, vector_store: FAISS, manifest: Dict[str, dict]):
+        """Write index files under a new version, then point the manifest at it"""
+        path.mkdir(parents=True, exist_ok=True)
+        version = uuid.uuid4().hex
+        tmp_manifest = path / f".tmp-{version}-{self.MANIFEST_FILE}"
+        swapped = False
+        try:
+            vector_store.save_local(str(path), index_name=self._index_name(version))
+            with open(tmp_manifest, "w") as f:
+                json.dump({"files": manifest, "version": version}, f)
+            with file_lock(path / self.LOCK_FILE):
+                replaced = self._current_version(path)
+                os.replace(tmp_manifest, path / self.MANIFEST_FILE)
+                swapped = True
+                if replaced:
+                    self._remove_version(path, replaced)
+            logger.info(f"Saved FAISS index to {path}")
+        except OSError as e:
+            logger.warning(f"Could not save index to {path}: {str(e)}")
+            if not swapped:
+                self._remove_version(path, version)
+                tmp_manifest.unlink(missing_ok=True)
+
+    def _current_version(self, path: Path) -> Optional[str]:
+        try:
+            with open(path / self.MANIFEST_FILE, "r") as f:
+                return json.load(f).get("version")
+        except (OSError, ValueError):
+            return None
+
+    def _remove_version(self, path: Path, version: str):
+        for suffix in (".faiss", ".pkl"):
+            (path / f"{self._index_name(version)}{suffix}").unlink(missing_ok=True)
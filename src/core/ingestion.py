@@ -0,0 +1,214 @@
+import gzip
+import json
+import multiprocessing
+import os
+import uuid
+import tiktoken
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from langchain_core.documents import Document
+from langchain_core.document_loaders import Blob
+from langchain_community.document_loaders.parsers import LanguageParser
+from langchain_text_splitters import RecursiveCharacterTextSplitter, Language
+from config.settings import config, RetrievalSettings
+from core.spans import locate_chunks
+from core.symbol_index import extract_symbols
+from utils.common_utils import CommonUtils
+from utils.git_objects import GitObjectReader
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A file's path, its chunks and its symbols, or None if it does not parse
+ParsedFile = Tuple[str, List[Document], Optional[dict]]
+
+_worker_ingestor: Optional["RepositoryIngestor"] = None
+
+
+def _init_worker(
+    repo_path: str,
+    retrieval_settings: dict,
+    blobs: Optional[Dict[str, str]],
+    encoding: str,
+):
+    """Set up a parser in a pool process with the parent's retrieval settings"""
+    global _worker_ingestor
+    config.retrieval = RetrievalSettings(**retrieval_settings)
+    _worker_ingestor = RepositoryIngestor(
+        repo_path, workers=1, blobs=blobs, encoding=encoding
+    )
+
+
+def _file_batch(files: List[str], chunks: bool) -> List[ParsedFile]:
+    return list(_worker_ingestor.iter_files(files, chunks))
+
+
+class RepositoryIngestor:
+    """Parses and splits repository files into retrieval chunks in one pass.
+
+    Given a map of file paths to blob hashes, file contents are streamed from
+    the git object database instead of being read from a checkout. Each chunk
+    carries a ``token_count`` for the LLM's tokenizer and, when its text occurs
+    verbatim in the file, its character and line span. The same pass extracts
+    each file's symbols for the ``SymbolIndex``.
+    """
+
+    def __init__(
+        self,
+        repo_path: str,
+        workers: Optional[int] = None,
+        blobs: Optional[Dict[str, str]] = None,
+        encoding: Optional[str] = None,
+    ):
+        self.repo_path = Path(repo_path)
+        self.workers = workers or config.retrieval.ingestion_workers
+        self.blobs = blobs
+        self.encoding = encoding or CommonUtils.get_encoder().name
+        self.encoder = tiktoken.get_encoding(self.encoding)
+        self.parser = LanguageParser(
+            language="python", parser_threshold=config.retrieval.parser_threshold
+        )
+        self.splitter = RecursiveCharacterTextSplitter.from_language(
+            language=Language.PYTHON,
+            chunk_size=config.retrieval.chunk_size,
+            chunk_overlap=config.retrieval.chunk_overlap,
+        )
+
+    def iter_chunks(self, files: Iterable[str]) -> Iterator[Document]:
+        """Stream chunks in file order"""
+        for _, chunks, _ in self.iter_files(files):
+            yield from chunks
+
+    def iter_files(
+        self, files: Iterable[str], chunks: bool = True
+    ) -> Iterator[ParsedFile]:
+        """Stream parsed files in order, fanning batches out to a process pool.
+
+        With ``chunks=False`` only symbols are extracted.
+        """
+        files = list(files)
+        batch_size = config.retrieval.ingestion_batch_size
+        if self.workers <= 1 or len(files) <= batch_size:
+            yield from self._iter_serial(files, chunks)
+            return
+
+        batches = [files[i : i + batch_size] for i in range(0, len(files), batch_size)]
+        with ProcessPoolExecutor(
+            max_workers=min(self.workers, len(batches)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                str(self.repo_path),
+                config.retrieval.model_dump(),
+                self.blobs,
+                self.encoding,
+            ),
+        ) as executor:
+            # map() yields results in submission order, keeping output deterministic
+            for parsed in executor.map(_file_batch, batches, [chunks] * len(batches)):
+                yield from parsed
+
+    def _iter_serial(
+        self, files: Iterable[str], chunks: bool = True
+    ) -> Iterator[ParsedFile]:
+        for file, blob in self._iter_blobs(files):
+            try:
+                source_text = blob.as_string()
+                docs = list(self.parser.lazy_parse(blob)) if chunks else []
+            except Exception as e:
+                logger.warning(f"Error processing document {file}: {str(e)}")
+                continue
+
+            symbols = extract_symbols(source_text, file)
+            if not chunks:
+                yield file, [], symbols
+                continue
+            for doc in docs:
+                doc.metadata.update({"source": file, "file_type": Path(file).suffix})
+            file_chunks = self.splitter.split_documents(docs)
+            locate_chunks(source_text, file_chunks)
+            self.add_token_counts(file_chunks)
+            yield file, file_chunks, symbols
+
+    def add_token_counts(self, docs: List[Document]):
+        """Store each chunk's token count in its metadata"""
+        token_lists = self.encoder.encode_batch(
+            [doc.page_content for doc in docs], disallowed_special=()
+        )
+        for doc, tokens in zip(docs, token_lists):
+            doc.metadata["token_count"] = len(tokens)
+
+    def _iter_blobs(self, files: Iterable[str]) -> Iterator[Tuple[str, Blob]]:
+        if self.blobs is None:
+            for file in files:
+                yield file, Blob.from_path(self.repo_path / file)
+            return
+
+        files = list(files)
+        with GitObjectReader(self.repo_path) as reader, closing(
+            reader.iter_read(self.blobs[file] for file in files)
+        ) as contents:
+            for file, (sha, data) in zip(files, contents):
+                if data is None:
+                    logger.warning(f"Blob {sha} of {file} is missing")
+                    continue
+                yield file, Blob.from_data(data, path=file)
+
+    def load_chunks(self, files: Iterable[str]) -> List[Document]:
+        return list(self.iter_chunks(files))
+
+
+class ChunkStore:
+    """Gzipped JSON-lines cache of the parsed chunks of one commit.
+
+    A header line records the format version and the tokenizer the chunks'
+    token counts belong to. Caches of another version are treated as missing.
+    """
+
+    CHUNKS_FILE = "chunks.jsonl.gz"
+    VERSION = 2
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.file_path = self.path / self.CHUNKS_FILE
+        self.encoding: Optional[str] = None
+
+    def load(self) -> Optional[List[Document]]:
+        """Return cached chunks, or None when the cache is missing or unreadable"""
+        if not self.file_path.exists():
+            return None
+        try:
+            with gzip.open(self.file_path, "rt", encoding="utf-8") as f:
+                header = json.loads(f.readline() or "{}")
+                if header.get("version") != self.VERSION:
+                    logger.info(f"Ignoring outdated chunk cache {self.file_path}")
+                    return None
+                self.encoding = header.get("encoding")
+                docs = [
+                    Document(page_content=record["c"], metadata=record["m"])
+                    for record in map(json.loads, f)
+                ]
+            logger.info(f"Loaded {len(docs)} cached chunks from {self.file_path}")
+            return docs
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable chunk cache {self.file_path}: {e}")
+            return None
+
+    def save(self, docs: List[Document], encoding: str):
+        """Atomically write chunks so concurrent readers never see partial data"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path / f".{self.CHUNKS_FILE}.{uuid.uuid4().hex}"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=1) as f:
+                f.write(json.dumps({"version": self.VERSION, "encoding": encoding}))
+                f.write("\n")
+                for doc in docs:
+                    f.write(json.dumps({"c": doc.page_content, "m": doc.metadata}))
+                    f.write("\n")
+            os.replace(tmp_path, self.file_path)
+            self.encoding = encoding
+        except OSError as e:
+            logger.warning(f"Could not save chunk cache {self.file_path}: {str(e)}")
+            tmp_path.unlink(missing_ok=True)
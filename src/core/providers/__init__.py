@@ -1,13 +1,26 @@
 from .base_provider import BaseProvider
 from .deepseek_provider import DeepSeekProvider
+from .embedding_cache import CachedEmbeddings, EmbeddingCache
+from .embedding_pipeline import EmbeddingPipeline, RateLimitedEmbeddings, RateLimiter
+from .fake_provider import FakeChatModel, FakeEmbeddings, FakeProvider
+from .llm_cache import PersistentLLMCache
 from .provider_factory import ProviderFactory
 from .ollama_provider import OllamaProvider
 from .openai_provider import OpenAIProvider
 
 __all__ = [
     "BaseProvider",
+    "CachedEmbeddings",
     "DeepSeekProvider",
+    "EmbeddingCache",
+    "EmbeddingPipeline",
+    "FakeChatModel",
+    "FakeEmbeddings",
+    "FakeProvider",
     "ProviderFactory",
     "OllamaProvider",
     "OpenAIProvider",
+    "PersistentLLMCache",
+    "RateLimitedEmbeddings",
+    "RateLimiter",
 ]
@@ -6,6 +6,9 @@ from langchain_core.embeddings import Embeddings
 class BaseProvider(ABC):
     """Base class for LLM providers."""
 
+    # Maximum number of instances that may call the provider concurrently
+    max_concurrency: int = 8
+
     @classmethod
     @abstractmethod
     def supports(cls, model_name: str) -> bool:
@@ -2,7 +2,9 @@ from .base_provider import BaseProvider
 from langchain_core.language_models import BaseLanguageModel
 from langchain_core.embeddings import Embeddings
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
 from config.settings import config
+from core.telemetry import arecord_llm_request, record_llm_request
 
 
 class DeepSeekProvider(BaseProvider):
@@ -18,6 +20,13 @@ class DeepSeekProvider(BaseProvider):
             temperature=config.models.temperature,
             openai_api_key=config.deepseek_api_key.get_secret_value(),
             base_url=config.models.deepseek_base_url,
+            # Requests are counted so SDK retries show up in traces
+            http_client=DefaultHttpxClient(
+                event_hooks={"request": [record_llm_request]}
+            ),
+            http_async_client=DefaultAsyncHttpxClient(
+                event_hooks={"request": [arecord_llm_request]}
+            ),
             **kwargs
         )
 
@@ -25,5 +34,6 @@ class DeepSeekProvider(BaseProvider):
         return OpenAIEmbeddings(
             model=config.models.embeddings_model,
             openai_api_key=config.openai_api_key.get_secret_value(),
+            base_url=config.models.embeddings_base_url,
             **kwargs
         )
@@ -0,0 +1,241 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+from pathlib import Path
+from langchain_core.embeddings import Embeddings
+from config.settings import config
+from core.telemetry import record_embedding
+from typing import Dict, List, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Content-addressed float32 vector store shared between processes.
+
+    Vectors are appended to a flat ``vectors.f32`` file that readers memory-map,
+    while a SQLite index in WAL mode maps content hashes to row numbers. Writers
+    serialize on the SQLite write lock, so several runner processes can share
+    one cache directory.
+    """
+
+    _QUERY_BATCH = 500
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.path / "index.sqlite"
+        self.vectors_path = self.path / "vectors.f32"
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._init_db()
+        self.dim = self._read_dim()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, row INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+        )
+
+    def _read_dim(self) -> Optional[int]:
+        row = (
+            self._connection()
+            .execute("SELECT value FROM meta WHERE name = 'dim'")
+            .fetchone()
+        )
+        return int(row[0]) if row else None
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return cached vectors for keys, None where missing"""
+        rows = self._lookup_rows(keys)
+        if not rows:
+            return [None] * len(keys)
+
+        vectors = self._vector_view(max(rows.values()))
+        return [np.array(vectors[rows[key]]) if key in rows else None for key in keys]
+
+    def put_many(self, keys: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Append vectors for keys not stored yet"""
+        if not keys:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.dim = self._read_dim()
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+                conn.execute(
+                    "INSERT INTO meta (name, value) VALUES ('dim', ?)", (self.dim,)
+                )
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(
+                    f"Embedding size {matrix.shape[1]} does not match cache size {self.dim}"
+                )
+
+            existing = self._lookup_rows(keys)
+            new = {}
+            for i, key in enumerate(keys):
+                if key not in existing and key not in new:
+                    new[key] = i
+            if new:
+                start_row = self._append_rows(matrix[list(new.values())])
+                conn.executemany(
+                    "INSERT INTO embeddings (key, row) VALUES (?, ?)",
+                    [(key, start_row + n) for n, key in enumerate(new)],
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _lookup_rows(self, keys: Sequence[str]) -> Dict[str, int]:
+        conn = self._connection()
+        rows = {}
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), self._QUERY_BATCH):
+            batch = unique[i : i + self._QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows.update(
+                conn.execute(
+                    f"SELECT key, row FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+            )
+        return rows
+
+    def _append_rows(self, matrix: np.ndarray) -> int:
+        """Write rows at the end of the vector file; caller holds the write lock"""
+        row_bytes = self.dim * 4
+        size = self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        # Skip over a partial row left behind by an interrupted writer
+        start_row = -(-size // row_bytes)
+        with open(self.vectors_path, "ab") as f:
+            f.write(b"\0" * (start_row * row_bytes - size))
+            f.write(matrix.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        return start_row
+
+    def _vector_view(self, max_row: int) -> np.ndarray:
+        """Memory-map the vector file, remapping when it has grown"""
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[0] <= max_row:
+                if self.dim is None:
+                    self.dim = self._read_dim()
+                rows = self.vectors_path.stat().st_size // (self.dim * 4)
+                self._vectors = np.memmap(
+                    self.vectors_path,
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(rows, self.dim),
+                )
+            return self._vectors
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends uncached texts and queries to the provider"""
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        namespace: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+    ):
+        self.underlying = underlying
+        self.namespace = namespace or config.models.embeddings_model
+        cache_root = Path(cache_dir or config.cache.cache_dir) / "embeddings"
+        self.cache = EmbeddingCache(
+            cache_root / re.sub(r"[^\w.-]", "_", self.namespace)
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def content_key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._lookup(texts)
+        if missing:
+            embedded = self.underlying.embed_documents(list(missing.values()))
+            self._store(keys, vectors, missing, embedded)
+        return [vector.tolist() for vector in vectors]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._lookup(texts)
+        if missing:
+            embedded = await self.underlying.aembed_documents(list(missing.values()))
+            self._store(keys, vectors, missing, embedded)
+        return [vector.tolist() for vector in vectors]
+
+    @classmethod
+    def query_key(cls, text: str) -> str:
+        # Some providers embed queries differently from documents
+        return cls.content_key(f"query\0{text}")
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._lookup_query(text)
+        if vector is None:
+            vector = self.underlying.embed_query(text)
+            self.cache.put_many([self.query_key(text)], [vector])
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self._lookup_query(text)
+        if vector is None:
+            vector = await self.underlying.aembed_query(text)
+            self.cache.put_many([self.query_key(text)], [vector])
+        return vector
+
+    def _lookup_query(self, text: str) -> Optional[List[float]]:
+        started = time.time()
+        vector = self.cache.get_many([self.query_key(text)])[0]
+        if vector is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        record_embedding("cache", started, cache_hits=1)
+        return vector.tolist()
+
+    def _lookup(self, texts: List[str]):
+        started = time.time()
+        keys = [self.content_key(text) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        hits = len(texts) - sum(1 for vector in vectors if vector is None)
+        self.hits += hits
+        self.misses += len(missing)
+        if hits:
+            record_embedding("cache", started, cache_hits=hits)
+        logger.debug(f"Embedding cache: {len(missing)} of {len(texts)} texts missing")
+        return keys, vectors, missing
+
+    def _store(self, keys, vectors, missing, embedded):
+        self.cache.put_many(list(missing), embedded)
+        fresh = dict(zip(missing, np.asarray(embedded, dtype=np.float32)))
+        for i, key in enumerate(keys):
+            if vectors[i] is None:
+                vectors[i] = fresh[key]
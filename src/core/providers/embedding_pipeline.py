@@ -0,0 +1,278 @@
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+from config.settings import config
+from core.telemetry import record_embedding
+from utils.common_utils import CommonUtils
+from typing import Deque, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from openai import APIConnectionError
+except ImportError:
+    APIConnectionError = ConnectionError
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, shared by threads.
+
+    Either limit may be None to leave it unbounded. After a 429 the limiter
+    can be paused so every caller backs off, not just the one that was told.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 0):
+        """Block until a request of this many tokens may be sent"""
+        if self.tokens_per_minute:
+            # A request larger than the bucket could never be admitted otherwise
+            tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if self.requests_per_minute and self._requests < 1:
+                    wait = max(
+                        wait, (1 - self._requests) * 60 / self.requests_per_minute
+                    )
+                if self.tokens_per_minute and self._tokens < tokens:
+                    wait = max(
+                        wait, (tokens - self._tokens) * 60 / self.tokens_per_minute
+                    )
+                if wait <= 0:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(
+                self.requests_per_minute,
+                self._requests + elapsed * self.requests_per_minute / 60,
+            )
+        if self.tokens_per_minute:
+            self._tokens = min(
+                self.tokens_per_minute,
+                self._tokens + elapsed * self.tokens_per_minute / 60,
+            )
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """Embeddings wrapper that paces provider calls and retries transient errors.
+
+    Every call first takes its request and token estimate, counted with the
+    embeddings model's tokenizer, from the shared limiter. Rate limit, server
+    and connection errors are retried with exponential backoff and full
+    jitter, honouring ``Retry-After``.
+    """
+
+    BASE_DELAY = 1.0
+    MAX_DELAY = 60.0
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        limiter: Optional[RateLimiter] = None,
+        max_retries: Optional[int] = None,
+    ):
+        self.underlying = underlying
+        self.limiter = limiter or RateLimiter(
+            config.models.embedding_requests_per_minute,
+            config.models.embedding_tokens_per_minute,
+        )
+        self.max_retries = (
+            config.models.embedding_max_retries if max_retries is None else max_retries
+        )
+        self.retries = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Counted without the token memo, which chunk texts would only flush
+        encoded = CommonUtils.get_encoder(config.models.embeddings_model).encode_batch(
+            texts, disallowed_special=()
+        )
+        tokens = sum(map(len, encoded))
+        return self._call(
+            "documents", lambda: self.underlying.embed_documents(texts), tokens
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        tokens = CommonUtils.calculate_tokens(text, config.models.embeddings_model)
+        return self._call("query", lambda: self.underlying.embed_query(text), tokens)
+
+    def _call(self, name: str, request, tokens: int):
+        started = time.time()
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                result = request()
+                record_embedding(name, started, tokens=tokens, retries=attempt)
+                return result
+            except Exception as e:
+                if attempt == self.max_retries or not self._is_retryable(e):
+                    raise
+                delay = self._retry_delay(e, attempt)
+                self.retries += 1
+                if getattr(e, "status_code", None) == 429:
+                    self.limiter.pause(delay)
+                logger.warning(
+                    f"Embedding request failed ({str(e)}), retrying in {delay:.1f}s"
+                )
+                time.sleep(delay)
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        status = getattr(error, "status_code", None)
+        if status is not None:
+            return status in (408, 409, 429) or status >= 500
+        return isinstance(error, (APIConnectionError, ConnectionError, TimeoutError))
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        backoff = random.uniform(0, min(self.MAX_DELAY, self.BASE_DELAY * 2**attempt))
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            retry_after = float(headers.get("retry-after", 0))
+        except (TypeError, ValueError):
+            retry_after = 0.0
+        return retry_after + backoff if retry_after else backoff
+
+
+class EmbeddingPipeline:
+    """Embeds chunks in token-bounded batches and streams them into FAISS.
+
+    Batches are sent from a thread pool, at most ``concurrency`` at a time,
+    and added to the index in input order as they complete, so the finished
+    index does not depend on which request returned first.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_tokens: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ):
+        self.embeddings = embeddings
+        self.batch_tokens = batch_tokens or config.models.embedding_batch_tokens
+        self.batch_size = batch_size or config.models.embedding_batch_size
+        self.concurrency = concurrency or config.models.embedding_concurrency
+
+    def batches(self, docs: List[Document]) -> List[Tuple[int, int]]:
+        """Split docs into consecutive (start, end) ranges within the limits"""
+        ranges, start, tokens = [], 0, 0
+        for i, count in enumerate(self._token_counts(docs)):
+            if i > start and (
+                tokens + count > self.batch_tokens or i - start >= self.batch_size
+            ):
+                ranges.append((start, i))
+                start, tokens = i, 0
+            tokens += count
+        if start < len(docs):
+            ranges.append((start, len(docs)))
+        return ranges
+
+    @staticmethod
+    def _token_counts(docs: List[Document]) -> List[int]:
+        """Count tokens with the embeddings model's tokenizer"""
+        encoder = CommonUtils.get_encoder(config.models.embeddings_model)
+        # Chunks carry counts for the LLM, only valid for the same encoding
+        reuse = encoder.name == CommonUtils.get_encoder().name
+        counts = [doc.metadata.get("token_count") if reuse else None for doc in docs]
+        missing = [i for i, count in enumerate(counts) if count is None]
+        if missing:
+            encoded = encoder.encode_batch(
+                [docs[i].page_content for i in missing], disallowed_special=()
+            )
+            for i, tokens in zip(missing, encoded):
+                counts[i] = len(tokens)
+        return counts
+
+    def iter_embeddings(
+        self, docs: List[Document]
+    ) -> Iterator[Tuple[int, int, List[List[float]]]]:
+        """Yield (start, end, vectors) per batch in order"""
+        texts = [doc.page_content for doc in docs]
+        ranges = iter(self.batches(docs))
+        pending: Deque[Tuple[int, int, Future]] = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+
+            def submit():
+                for start, end in ranges:
+                    # Requests are traced for the instance that started the build
+                    future = executor.submit(
+                        contextvars.copy_context().run,
+                        self.embeddings.embed_documents,
+                        texts[start:end],
+                    )
+                    pending.append((start, end, future))
+                    return
+
+            try:
+                # Keep a second wave queued so workers never wait on the consumer
+                for _ in range(self.concurrency * 2):
+                    submit()
+                while pending:
+                    start, end, future = pending.popleft()
+                    vectors = future.result()
+                    submit()
+                    yield start, end, vectors
+            finally:
+                for _, _, future in pending:
+                    future.cancel()
+
+    def add_documents(
+        self,
+        docs: List[Document],
+        ids: Optional[List[str]] = None,
+        vector_store: Optional[FAISS] = None,
+    ) -> FAISS:
+        """Embed docs into vector_store, creating it from the first batch if None"""
+        started = time.perf_counter()
+        for start, end, vectors in self.iter_embeddings(docs):
+            text_embeddings = list(
+                zip((doc.page_content for doc in docs[start:end]), vectors)
+            )
+            metadatas = [doc.metadata for doc in docs[start:end]]
+            batch_ids = ids[start:end] if ids else None
+            if vector_store is None:
+                vector_store = FAISS.from_embeddings(
+                    text_embeddings, self.embeddings, metadatas=metadatas, ids=batch_ids
+                )
+            else:
+                vector_store.add_embeddings(
+                    text_embeddings, metadatas=metadatas, ids=batch_ids
+                )
+            logger.debug(f"Embedded {end} of {len(docs)} chunks")
+
+        if vector_store is None:
+            raise ValueError("Cannot build a vector store without documents")
+        logger.info(
+            f"Embedded {len(docs)} chunks in {time.perf_counter() - started:.1f}s"
+        )
+        return vector_store
@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from pathlib import Path
+from pydantic import Field
+from .base_provider import BaseProvider
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from config.settings import config
+from utils.common_utils import CommonUtils
+from typing import Any, Dict, List, Optional, Tuple
+
+# Responses keyed by markers of the prompts in core/prompts, first match wins
+SCRIPTED_RESPONSES: List[Tuple[str, str]] = [
+    (r"comma-separated list", "{identifiers}"),
+    (r"ANALYZE\|EDIT", "{decision}"),
+    (r"Role: (Quality Assurance Engineer|Senior Python Reviewer)", "VALID: fake"),
+    (
+        r"Role: Senior Code Analyst",
+        "# Target Identification\nCritical Issue: {identifiers}\n\n"
+        "# Risk Assessment\nLow\n\n# Action Plan\n1. Fix {identifier}",
+    ),
+    (
+        r"Role: Senior Python Engineer",
+        "diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n"
+        "@@ -1,1 +1,2 @@\n # fake\n+# fixed {identifier}\n",
+    ),
+    (r"Senior Code Reviewer", "STATUS: APPROVED"),
+]
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model answering the workflow's prompts deterministically.
+
+    Responses come from a JSONL file of ``{"prompt": ..., "response": ...}``
+    pairs replayed for identical prompts and ``{"match": ..., "response": ...}``
+    rules matched as regexes, falling back to scripted answers for the
+    built-in prompts. Usage metadata is counted with the configured encoder.
+    """
+
+    latency: float = 0.0
+    replies: Dict[str, str] = Field(default_factory=dict)
+    rules: List[Tuple[str, str]] = Field(default_factory=list)
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None, **kwargs) -> "FakeChatModel":
+        replies, rules = {}, []
+        if path:
+            for line in Path(path).read_text(encoding="utf-8").splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if "prompt" in entry:
+                    replies[cls._digest(entry["prompt"])] = entry["response"]
+                else:
+                    rules.append((entry["match"], entry["response"]))
+        return cls(replies=replies, rules=rules, **kwargs)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _generate(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = "\n\n".join(str(message.content) for message in messages)
+        content = self._answer(prompt)
+        input_tokens = CommonUtils.calculate_tokens(prompt)
+        output_tokens = CommonUtils.calculate_tokens(content)
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _answer(self, prompt: str) -> str:
+        reply = self.replies.get(self._digest(prompt))
+        if reply is not None:
+            return reply
+        for pattern, response in self.rules:
+            if re.search(pattern, prompt):
+                return response
+        for pattern, template in SCRIPTED_RESPONSES:
+            if re.search(pattern, prompt):
+                return self._fill(template, prompt)
+        return "OK"
+
+    @staticmethod
+    def _fill(template: str, prompt: str) -> str:
+        identifiers = list(
+            dict.fromkeys(re.findall(r"\b[A-Za-z_]+_[A-Za-z0-9_]+\b", prompt))
+        )[:3] or ["fake"]
+        paths = re.findall(r"\b[\w/]+\.py\b", prompt)
+        return template.format(
+            identifiers=", ".join(identifiers),
+            identifier=identifiers[0],
+            # Analyze until an analysis exists, then edit
+            decision="ANALYZE" if "No previous analysis" in prompt else "EDIT",
+            path=paths[0] if paths else "fake.py",
+        )
+
+    @staticmethod
+    def _digest(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class FakeEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic embeddings seeded by the text, with a latency per request"""
+
+    latency: float = 0.0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+
+class FakeProvider(BaseProvider):
+    """Offline provider for benchmarks and local runs without API keys."""
+
+    max_concurrency = 64
+
+    @classmethod
+    def supports(cls, model_name: str) -> bool:
+        return model_name.startswith("fake")
+
+    def create_llm(self, **kwargs) -> BaseLanguageModel:
+        return FakeChatModel.from_file(
+            config.models.fake_responses_path,
+            latency=config.models.fake_latency,
+            **kwargs
+        )
+
+    def create_embeddings(self, **kwargs) -> Embeddings:
+        return FakeEmbeddings(
+            size=config.models.fake_embedding_size,
+            latency=config.models.fake_latency,
+            **kwargs
+        )
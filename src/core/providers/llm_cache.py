@@ -0,0 +1,141 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+from config.settings import config
+from core.telemetry import record_llm_cache_hit
+from typing import Any, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PersistentLLMCache(BaseCache):
+    """SQLite-backed LLM response cache with size-based LRU eviction.
+
+    Entries are keyed on a hash of the serialized messages and the model's
+    llm_string, which carries the model name and temperature. The database runs
+    in WAL mode so concurrent runner processes can share it. The store's size
+    is kept as a running total of this process's writes and read back from the
+    database only when it goes over budget, so entries added by other
+    processes are accounted for at eviction time.
+    """
+
+    def __init__(self, path: Optional[Path] = None, max_bytes: Optional[int] = None):
+        self.path = Path(path or Path(config.cache.cache_dir) / "llm_cache.sqlite")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes or config.cache.llm_max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, "
+            "value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._connection().execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._size = self._stored_size()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self._count(hit=False)
+            return None
+
+        conn.execute(
+            "UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key)
+        )
+        self._count(hit=True)
+        record_llm_cache_hit()
+        return loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        value = zlib.compress(dumps(list(return_val)).encode("utf-8"))
+        key = self._key(prompt, llm_string)
+        conn = self._connection()
+        replaced = conn.execute(
+            "SELECT size FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, size, accessed) "
+            "VALUES (?, ?, ?, ?)",
+            (key, value, len(value), time.time()),
+        )
+        with self._lock:
+            self._size += len(value) - (replaced[0] if replaced else 0)
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self._evict()
+
+    def clear(self, **kwargs: Any):
+        self._connection().execute("DELETE FROM responses")
+        with self._lock:
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        entries, size = (
+            self._connection()
+            .execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses")
+            .fetchone()
+        )
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _stored_size(self) -> int:
+        (total,) = (
+            self._connection()
+            .execute("SELECT COALESCE(SUM(size), 0) FROM responses")
+            .fetchone()
+        )
+        return total
+
+    def _evict(self):
+        """Drop least recently used entries once the store exceeds max_bytes"""
+        # Other processes may have evicted or added entries since the last sync
+        total = self._stored_size()
+        if total > self.max_bytes:
+            excess = total - int(self.max_bytes * 0.9)
+            self._connection().execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM ("
+                "SELECT key, size, SUM(size) OVER (ORDER BY accessed, key) AS running "
+                "FROM responses) WHERE running - size < ?)",
+                (excess,),
+            )
+            logger.debug(f"Evicted LLM cache entries to free {excess} bytes")
+            total = self._stored_size()
+        with self._lock:
+            self._size = total
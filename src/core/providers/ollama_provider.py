@@ -8,6 +8,9 @@ from config.settings import config
 class OllamaProvider(BaseProvider):
     """Provider for Ollama models."""
 
+    # A local Ollama server processes requests one at a time by default
+    max_concurrency = 1
+
     @classmethod
     def supports(cls, model_name: str) -> bool:
         return model_name.startswith("llama")
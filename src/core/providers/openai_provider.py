@@ -2,12 +2,16 @@ from .base_provider import BaseProvider
 from langchain_core.language_models import BaseLanguageModel
 from langchain_core.embeddings import Embeddings
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
 from config.settings import config
+from core.telemetry import arecord_llm_request, record_llm_request
 
 
 class OpenAIProvider(BaseProvider):
     """Provider for OpenAI models."""
 
+    max_concurrency = 16
+
     @classmethod
     def supports(cls, model_name: str) -> bool:
         return model_name.startswith("gpt-")
@@ -17,6 +21,13 @@ class OpenAIProvider(BaseProvider):
             model=config.models.llm_model,
             temperature=config.models.temperature,
             openai_api_key=config.openai_api_key.get_secret_value(),
+            # Requests are counted so SDK retries show up in traces
+            http_client=DefaultHttpxClient(
+                event_hooks={"request": [record_llm_request]}
+            ),
+            http_async_client=DefaultAsyncHttpxClient(
+                event_hooks={"request": [arecord_llm_request]}
+            ),
             **kwargs
         )
 
@@ -24,5 +35,6 @@ class OpenAIProvider(BaseProvider):
         return OpenAIEmbeddings(
             model=config.models.embeddings_model,
             openai_api_key=config.openai_api_key.get_secret_value(),
+            base_url=config.models.embeddings_base_url,
             **kwargs
         )
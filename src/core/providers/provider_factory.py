@@ -1,5 +1,6 @@
 from .base_provider import BaseProvider
 from .deepseek_provider import DeepSeekProvider
+from .fake_provider import FakeProvider
 from .ollama_provider import OllamaProvider
 from .openai_provider import OpenAIProvider
 
@@ -7,7 +8,7 @@ from .openai_provider import OpenAIProvider
 class ProviderFactory:
     """Factory to get the appropriate provider."""
 
-    _providers = [DeepSeekProvider, OpenAIProvider, OllamaProvider]
+    _providers = [DeepSeekProvider, OpenAIProvider, OllamaProvider, FakeProvider]
 
     @classmethod
     def get_provider(cls, model_name: str) -> BaseProvider:
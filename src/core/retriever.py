@@ -1,158 +1,429 @@
 from pathlib import Path
+from pydantic import BaseModel
 from langchain_core.documents import Document
 from langchain_core.language_models import BaseLanguageModel
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.embeddings import Embeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.retrievers import BM25Retriever
-from langchain_community.document_loaders.generic import GenericLoader
-from langchain_community.document_loaders.parsers import LanguageParser
-from langchain_text_splitters import RecursiveCharacterTextSplitter, Language
 from config.settings import config
-from typing import List
+from core.bm25 import BM25Index
+from core.fusion import diversify, fuse_rankings, unique_docs
+from core.index_store import IndexStore
+from core.ingestion import ChunkStore, RepositoryIngestor
+from core.spans import has_span
+from core.symbol_index import SymbolIndex
+from core.term_extractor import LocalTermExtractor
+from utils.git_utils import list_source_blobs, resolve_commit
+from typing import Dict, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class RetrievalCandidates(BaseModel):
+    key_terms: List[str]
+    bm25_hits: List[Tuple[Document, float]]
+    vector_hits: List[Tuple[Document, float]]
+    definitions: List[Document]
+    callers: List[Document]
+
+
 class HybridRetriever:
-    def __init__(self, repo_path: str, llm: BaseLanguageModel, embeddings: Embeddings):
+    def __init__(
+        self,
+        repo_path: str,
+        llm: BaseLanguageModel,
+        embeddings: Embeddings,
+        commit: Optional[str] = None,
+        repo_name: Optional[str] = None,
+    ):
         self.repo_path = Path(repo_path)
         self.embeddings = embeddings
         self.llm = llm
-        self.index_path = Path(config.retrieval.vector_store_path) / self.repo_path.name
-        self.splitter = RecursiveCharacterTextSplitter.from_language(
-            language=Language.PYTHON,
-            chunk_size=config.retrieval.chunk_size,
-            chunk_overlap=config.retrieval.chunk_overlap,
+        self.commit = resolve_commit(self.repo_path, commit or "HEAD")
+        self.file_hashes = list_source_blobs(self.repo_path, self.commit)
+        self.index_store = IndexStore(
+            repo_name or self.repo_path.name, str(self.repo_path), embeddings
         )
+        use_git = config.retrieval.ingestion_backend == "git"
+        self.ingestor = RepositoryIngestor(
+            self.repo_path, blobs=self.file_hashes if use_git else None
+        )
+        self.chunk_store = ChunkStore(self.index_store.commit_path(self.commit))
         self._prepare_retrievers()
+        self.term_extractor = LocalTermExtractor(
+            self.file_hashes, self.bm25_index.has_terms
+        )
+        # Engineer iterations repeat queries, so results are kept per instance
+        self._results: Dict[Tuple[str, int, str], List[Document]] = {}
+        self._problem_candidates: Dict[Tuple[str, int], RetrievalCandidates] = {}
+        self._query_vectors: Dict[str, List[float]] = {}
 
     def _prepare_retrievers(self):
-        """Initialize both vector and BM25 retrievers"""
-        try:
-            self.vector_retriever = FAISS.load_local(
-                folder_path=str(self.index_path),
-                embeddings=self.embeddings,
-                allow_dangerous_deserialization=True,
-            )
-            logger.info(f"Loaded existing FAISS index from {self.index_path}")
-        except Exception as e:
-            logger.info(f"Creating new vector store in {self.index_path}")
-            docs = self._load_and_preprocess_docs()
-            self.vector_retriever = FAISS.from_documents(docs, self.embeddings)
-            self.vector_retriever.save_local(str(self.index_path))
-
-        docs = self._load_and_preprocess_docs()
-        self.bm25_retriever = BM25Retriever.from_documents(docs)
-        self.bm25_retriever.k = 15
-        self.all_chunks = docs
+        """Initialize both vector and BM25 retrievers from a single ingestion pass"""
+        file_hashes = self.file_hashes
+        docs = self.chunk_store.load()
+        fresh_chunks = docs is None
+        commit_path = self.index_store.commit_path(self.commit)
+        self.symbol_index = None if fresh_chunks else SymbolIndex.load(commit_path)
+        if fresh_chunks:
+            docs, symbols = self._build_chunks(file_hashes)
+            self.chunk_store.save(docs, self.ingestor.encoding)
+            self.symbol_index = SymbolIndex(symbols)
+            self.symbol_index.save(commit_path)
+        elif self.chunk_store.encoding != self.ingestor.encoding:
+            logger.info(f"Recounting chunk tokens for {self.ingestor.encoding}")
+            self.ingestor.add_token_counts(docs)
+            self.chunk_store.save(docs, self.ingestor.encoding)
+        if self.symbol_index is None:
+            self.symbol_index = SymbolIndex(self._build_symbols(file_hashes))
+            self.symbol_index.save(commit_path)
 
-    def _load_and_preprocess_docs(self) -> List[Document]:
-        """Load and preprocess documents from repository"""
-        loader = GenericLoader.from_filesystem(
-            self.repo_path,
-            glob="**/*",
-            suffixes=config.retrieval.relevant_extensions,
-            exclude=["**/test_*.py", "**/tests/*.py"],
-            parser=LanguageParser(
-                language="python", parser_threshold=config.retrieval.parser_threshold
-            ),
+        self.vector_retriever = self.index_store.load_or_build(
+            self.commit, file_hashes, lambda files: self._select_chunks(docs, files)
         )
-        raw_docs = loader.load()
-
-        processed_docs = []
-        for doc in raw_docs:
-            try:
-                source_path = Path(doc.metadata["source"])
-                doc.metadata.update(
-                    {
-                        "source": str(source_path.relative_to(self.repo_path)),
-                        "file_type": source_path.suffix,
-                    }
+
+        bm25_path = commit_path / "bm25"
+        self.bm25_index = None if fresh_chunks else BM25Index.load(bm25_path)
+        if self.bm25_index is None or self.bm25_index.num_docs != len(docs):
+            logger.info(f"Building BM25 index in {bm25_path}")
+            self.bm25_index = BM25Index.build(doc.page_content for doc in docs)
+            self.bm25_index.save(bm25_path)
+        self.all_chunks = docs
+        # FAISS keeps its own copies of chunks, possibly from an older ingestion
+        self._chunks_by_content = {
+            (doc.metadata["source"], doc.page_content): doc for doc in docs
+        }
+        self._chunks_by_file: Dict[str, List[Document]] = {}
+        # Workflow state refers to chunks by id, numbered per file like the index
+        self._chunk_ids: Dict[int, str] = {}
+        self._chunks_by_id: Dict[str, Document] = {}
+        for doc in docs:
+            source = doc.metadata["source"]
+            file_chunks = self._chunks_by_file.setdefault(source, [])
+            chunk_id = f"{source}@{file_hashes.get(source)}:{len(file_chunks)}"
+            file_chunks.append(doc)
+            self._chunk_ids[id(doc)] = chunk_id
+            self._chunks_by_id[chunk_id] = doc
+        self._chunks_by_file = {
+            path: [doc for doc in file_chunks if has_span(doc)]
+            for path, file_chunks in self._chunks_by_file.items()
+        }
+
+    def _build_chunks(
+        self, file_hashes: Dict[str, str]
+    ) -> Tuple[List[Document], Dict[str, dict]]:
+        """Parse files, reusing chunks and symbols of unchanged blobs.
+
+        Chunks and symbols of files whose blob is the same in the nearest
+        indexed commit are taken from that commit's caches.
+        """
+        reused: Dict[str, List[Document]] = {}
+        base = self.index_store.find_nearest_commit(self.commit, file_hashes)
+        base_store = ChunkStore(self.index_store.commit_path(base)) if base else None
+        base_docs = base_store.load() if base_store else None
+        if base_docs:
+            base_blobs = {
+                path: entry["blob"]
+                for path, entry in self.index_store.read_manifest(base).items()
+            }
+            for doc in base_docs:
+                source = doc.metadata["source"]
+                if base_blobs.get(source) == file_hashes.get(source):
+                    reused.setdefault(source, []).append(doc)
+            if base_store.encoding != self.ingestor.encoding:
+                self.ingestor.add_token_counts(
+                    [doc for docs in reused.values() for doc in docs]
                 )
-                processed_docs.append(doc)
-            except Exception as e:
-                logger.warning(f"Error processing document: {str(e)}")
-                continue
+        symbols = self._reusable_symbols(base, file_hashes)
+
+        missing = sorted(path for path in file_hashes if path not in reused)
+        logger.info(
+            f"Parsing {len(missing)} files, reusing chunks of {len(reused)} from {base}"
+        )
+        parsed: Dict[str, List[Document]] = {}
+        for path, chunks, file_symbols in self.ingestor.iter_files(missing):
+            parsed[path] = chunks
+            if file_symbols is not None:
+                symbols[path] = {**file_symbols, "blob": file_hashes[path]}
 
-        return self.splitter.split_documents(processed_docs)
+        docs = [
+            doc
+            for path in sorted(file_hashes)
+            for doc in reused.get(path) or parsed.get(path, [])
+        ]
+        return docs, symbols
+
+    def _build_symbols(self, file_hashes: Dict[str, str]) -> Dict[str, dict]:
+        """Extract symbols for chunks cached before the symbol index existed"""
+        base = self.index_store.find_nearest_commit(self.commit, file_hashes)
+        symbols = self._reusable_symbols(base, file_hashes)
+        missing = sorted(path for path in file_hashes if path not in symbols)
+        logger.info(f"Extracting symbols of {len(missing)} files")
+        for path, _, file_symbols in self.ingestor.iter_files(missing, chunks=False):
+            if file_symbols is not None:
+                symbols[path] = {**file_symbols, "blob": file_hashes[path]}
+        return symbols
+
+    def _reusable_symbols(
+        self, base: Optional[str], file_hashes: Dict[str, str]
+    ) -> Dict[str, dict]:
+        base_index = (
+            SymbolIndex.load(self.index_store.commit_path(base)) if base else None
+        )
+        if base_index is None:
+            return {}
+        return {
+            path: entry
+            for path, entry in base_index.files.items()
+            if file_hashes.get(path) == entry["blob"]
+        }
+
+    def _select_chunks(self, docs: List[Document], files: List[str]) -> List[Document]:
+        """Pick the already parsed chunks belonging to the given files"""
+        wanted = set(files)
+        return [doc for doc in docs if doc.metadata["source"] in wanted]
 
     def retrieve(
         self, problem_stmt: str, feedback: str = "", top_k: int = 15
     ) -> List[Document]:
         """Retrieve relevant documents using hybrid approach"""
-        key_terms = self._extract_key_terms(problem_stmt, feedback)
-        focused_query = self._formulate_query(problem_stmt, key_terms)
+        problem_key = (self._normalize(problem_stmt), top_k)
+        key = (*problem_key, self._normalize(feedback))
+        if key not in self._results:
+            # Feedback only adds candidates to those of the problem statement
+            problem = self._problem_candidates.get(problem_key)
+            if problem is None:
+                terms = self._extract_key_terms(problem_stmt, "")
+                problem = self._search(problem_stmt, "", terms, top_k)
+                self._problem_candidates[problem_key] = problem
+            candidates = [problem]
+            if key[2]:
+                terms = self._new_terms(self._extract_key_terms("", feedback), problem)
+                candidates.append(self._search("", feedback, terms, top_k))
+            self._results[key] = self._merge_results(candidates, top_k)
+        return list(self._results[key])
 
-        # Retrieve from both methods
-        bm25_docs = self.bm25_retriever.invoke(focused_query)
-        vector_docs = self.vector_retriever.similarity_search(focused_query, k=top_k)
+    async def aretrieve(
+        self, problem_stmt: str, feedback: str = "", top_k: int = 15
+    ) -> List[Document]:
+        """Async variant of retrieve using the embeddings' and LLM's async APIs"""
+        problem_key = (self._normalize(problem_stmt), top_k)
+        key = (*problem_key, self._normalize(feedback))
+        if key not in self._results:
+            problem = self._problem_candidates.get(problem_key)
+            if problem is None:
+                terms = await self._aextract_key_terms(problem_stmt, "")
+                problem = await self._asearch(problem_stmt, "", terms, top_k)
+                self._problem_candidates[problem_key] = problem
+            candidates = [problem]
+            if key[2]:
+                terms = self._new_terms(
+                    await self._aextract_key_terms("", feedback), problem
+                )
+                candidates.append(await self._asearch("", feedback, terms, top_k))
+            self._results[key] = self._merge_results(candidates, top_k)
+        return list(self._results[key])
 
-        # Combine and process results
-        combined = self._combine_results(bm25_docs, vector_docs)
-        ranked = self._rank_documents(combined, key_terms)
-        return self._diversify_results(ranked, top_k)
+    def chunk_ids(self, docs: List[Document]) -> List[str]:
+        """Stable ids of retrieved chunks, for checkpointed workflow state"""
+        ids = []
+        for doc in docs:
+            chunk_id = self._chunk_ids.get(id(doc))
+            if chunk_id is None:
+                # A FAISS copy from an older ingestion, known to this process only
+                chunk_id = f"{doc.metadata.get('source')}@faiss:{len(self._chunk_ids)}"
+                self._chunk_ids[id(doc)] = chunk_id
+                self._chunks_by_id[chunk_id] = doc
+            ids.append(chunk_id)
+        return ids
 
-    def _extract_key_terms(self, problem: str, feedback: str) -> List[str]:
-        """Extract technical terms using LLM"""
-        messages = [
-            SystemMessage(content="Extract technical terms as comma-separated list"),
-            HumanMessage(content=f"Problem: {problem}\nFeedback: {feedback}"),
-        ]
-        response = self.llm.invoke(messages).content
-        return [term.strip() for term in response.split(",") if term.strip()]
+    def get_chunks(self, chunk_ids: List[str]) -> List[Document]:
+        """Chunks for ids from chunk_ids, skipping any no longer indexed"""
+        docs = [self._chunks_by_id.get(chunk_id) for chunk_id in chunk_ids]
+        if None in docs:
+            logger.warning(
+                f"Dropping {docs.count(None)} retrieved chunks missing from the index"
+            )
+        return [doc for doc in docs if doc is not None]
 
-    def _formulate_query(self, problem: str, terms: List[str]) -> str:
-        """Create focused retrieval query"""
-        return f"Problem: {problem} Keywords: {', '.join(terms)}"
+    def _search(
+        self, problem: str, feedback: str, key_terms: List[str], top_k: int
+    ) -> RetrievalCandidates:
+        """Run symbol, BM25 and vector search for one part of the inputs"""
+        query = self._formulate_query(problem, feedback, key_terms)
+        vector = self._query_vectors.get(query)
+        if vector is None:
+            vector = self._query_vectors[query] = self.embeddings.embed_query(query)
+        return self._candidates(
+            problem,
+            feedback,
+            key_terms,
+            query,
+            self.vector_retriever.similarity_search_with_score_by_vector(
+                vector, k=top_k
+            ),
+        )
 
-    def _combine_results(
+    async def _asearch(
+        self, problem: str, feedback: str, key_terms: List[str], top_k: int
+    ) -> RetrievalCandidates:
+        query = self._formulate_query(problem, feedback, key_terms)
+        vector = self._query_vectors.get(query)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(query)
+            self._query_vectors[query] = vector
+        return self._candidates(
+            problem,
+            feedback,
+            key_terms,
+            query,
+            await self.vector_retriever.asimilarity_search_with_score_by_vector(
+                vector, k=top_k
+            ),
+        )
+
+    def _candidates(
         self,
-        bm25_docs: List[Document],
-        vector_docs: List[Document],
-    ) -> List[Document]:
-        """Combine and deduplicate results"""
-        seen = set()
-        combined = []
-        for doc in bm25_docs + vector_docs:
-            doc_id = f"{doc.metadata['source']}:{hash(doc.page_content)}"
-            if doc_id not in seen:
-                combined.append(doc)
-                seen.add(doc_id)
-        return combined
-
-    def _rank_documents(
-        self, docs: List[Document], key_terms: List[str]
-    ) -> List[Document]:
-        """Rank documents by relevance to key terms"""
-        scored = []
-        for doc in docs:
-            score = sum(
-                1 for term in key_terms if term.lower() in doc.page_content.lower()
+        problem: str,
+        feedback: str,
+        key_terms: List[str],
+        query: str,
+        vector_hits: List[Tuple[Document, float]],
+    ) -> RetrievalCandidates:
+        definitions, callers = self._symbol_search(problem, feedback, key_terms)
+        return RetrievalCandidates(
+            key_terms=key_terms,
+            bm25_hits=self._bm25_search(query),
+            vector_hits=self._canonical_hits(vector_hits),
+            definitions=definitions,
+            callers=callers,
+        )
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join((text or "").split())
+
+    @staticmethod
+    def _new_terms(terms: List[str], known: RetrievalCandidates) -> List[str]:
+        """Feedback terms that the problem statement's search did not cover"""
+        seen = {term.lower() for term in known.key_terms}
+        return [term for term in terms if term.lower() not in seen]
+
+    def _symbol_search(
+        self, problem: str, feedback: str, key_terms: List[str]
+    ) -> Tuple[List[Document], List[Document]]:
+        """Chunks defining the named symbols or traceback lines, and their callers"""
+        settings = config.retrieval
+        definitions: List[Document] = []
+        callers: List[Document] = []
+        for path, line in self.term_extractor.frames(problem, feedback):
+            definitions.extend(self._chunks_at(path, line, line))
+        for term in key_terms:
+            if "/" in term:
+                continue
+            locations = self.symbol_index.lookup(term)
+            # A name defined all over the repository pins nothing in particular
+            if len(locations) > settings.max_symbol_definitions:
+                continue
+            for path, start, end in locations:
+                definitions.extend(self._chunks_at(path, start, end)[:2])
+                for site, line in self.symbol_index.callers_of(term, path)[
+                    : settings.max_symbol_callers
+                ]:
+                    callers.extend(self._chunks_at(site, line, line)[:1])
+        return unique_docs(definitions), unique_docs(callers)
+
+    def _chunks_at(self, path: str, start: int, end: int) -> List[Document]:
+        """Chunks of a file whose line span overlaps start to end"""
+        return [
+            doc
+            for doc in self._chunks_by_file.get(path, [])
+            if doc.metadata["start_line"] <= end and doc.metadata["end_line"] >= start
+        ]
+
+    def _bm25_search(self, query: str) -> List[Tuple[Document, float]]:
+        return [
+            (self.all_chunks[doc_id], score)
+            for doc_id, score in self.bm25_index.search(
+                query, config.retrieval.bm25_top_k
+            )
+        ]
+
+    def _canonical_hits(
+        self, hits: List[Tuple[Document, float]]
+    ) -> List[Tuple[Document, float]]:
+        """Swap FAISS's copies of chunks for the chunk objects BM25 returns"""
+        return [
+            (
+                self._chunks_by_content.get(
+                    (doc.metadata.get("source"), doc.page_content), doc
+                ),
+                distance,
             )
-            scored.append((doc, score))
+            for doc, distance in hits
+        ]
 
-        return [doc for doc, _ in sorted(scored, key=lambda x: x[1], reverse=True)]
+    def _merge_results(
+        self, candidates: List[RetrievalCandidates], top_k: int
+    ) -> List[Document]:
+        """Pin symbol definitions, then fuse all rankings by reciprocal rank"""
+        settings = config.retrieval
+        rankings, weights, key_terms = [], [], []
+        definitions, callers = [], []
+        for part in candidates:
+            if part.bm25_hits and part.vector_hits:
+                logger.debug(
+                    f"Top BM25 score {part.bm25_hits[0][1]:.3f}, "
+                    f"nearest vector distance {part.vector_hits[0][1]:.3f}"
+                )
+            rankings.append([doc for doc, _ in part.bm25_hits])
+            rankings.append([doc for doc, _ in part.vector_hits])
+            weights.extend([settings.bm25_weight, settings.vector_weight])
+            key_terms.extend(part.key_terms)
+            definitions.extend(part.definitions)
+            callers.extend(part.callers)
+        definitions = unique_docs(definitions)
+        rankings.append(unique_docs(definitions + callers))
+        weights.append(settings.symbol_weight)
 
-    def _diversify_results(self, docs: List[Document], top_k: int) -> List[Document]:
-        """Ensure diversity across different files"""
-        selected = []
-        seen_files = set()
+        pinned = definitions[: min(settings.max_pinned_chunks, top_k)]
+        ranked = fuse_rankings(
+            rankings,
+            key_terms,
+            weights=weights,
+            k=settings.rrf_k,
+            term_boost=settings.term_boost,
+        )
+        pinned_ids = {id(doc) for doc in pinned}
+        rest = [doc for doc in ranked if id(doc) not in pinned_ids]
+        return pinned + diversify(rest, top_k - len(pinned))
 
-        for doc in docs:
-            if len(selected) >= top_k:
-                break
-            source = doc.metadata["source"]
-            if source not in seen_files:
-                selected.append(doc)
-                seen_files.add(source)
+    def _extract_key_terms(self, problem: str, feedback: str) -> List[str]:
+        """Extract key terms locally, or with the LLM if configured to"""
+        if config.retrieval.key_term_extractor == "llm":
+            response = self.llm.invoke(self._key_terms_messages(problem, feedback))
+            return self._parse_key_terms(response.content)
+        return self.term_extractor.extract(problem, feedback)
 
-        # Fill remaining slots with highest scored
-        for doc in docs:
-            if len(selected) >= top_k:
-                break
-            if doc not in selected:
-                selected.append(doc)
+    async def _aextract_key_terms(self, problem: str, feedback: str) -> List[str]:
+        if config.retrieval.key_term_extractor == "llm":
+            response = await self.llm.ainvoke(
+                self._key_terms_messages(problem, feedback)
+            )
+            return self._parse_key_terms(response.content)
+        return self.term_extractor.extract(problem, feedback)
+
+    def _key_terms_messages(self, problem: str, feedback: str) -> list:
+        """Build the LLM prompt for technical term extraction"""
+        return [
+            SystemMessage(content="Extract technical terms as comma-separated list"),
+            HumanMessage(content=f"Problem: {problem}\nFeedback: {feedback}"),
+        ]
+
+    def _parse_key_terms(self, response: str) -> List[str]:
+        return [term.strip() for term in response.split(",") if term.strip()]
 
-        return selected
+    def _formulate_query(self, problem: str, feedback: str, terms: List[str]) -> str:
+        """Create focused retrieval query"""
+        text = f"Problem: {problem}" if problem else f"Feedback: {feedback}"
+        return f"{text} Keywords: {', '.join(terms)}"
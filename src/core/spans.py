@@ -0,0 +1,112 @@
+from bisect import bisect_right
+from itertools import accumulate
+from langchain_core.documents import Document
+from utils.common_utils import CommonUtils
+from typing import List, Optional, Tuple
+
+SPAN_KEYS = ("start_index", "end_index", "start_line", "end_line")
+
+
+def locate_chunks(source_text: str, chunks: List[Document]):
+    """Record where each chunk sits in its source file.
+
+    Chunks are searched for in order from just past the previous match, since
+    the splitter emits them in file order with bounded overlap. Chunks whose
+    text does not occur verbatim, such as parser summaries, get no span.
+    """
+    line_starts = [0, *accumulate(len(line) for line in source_text.splitlines(True))]
+    cursor = 0
+    for chunk in chunks:
+        start = source_text.find(chunk.page_content, cursor)
+        if start < 0:
+            start = source_text.find(chunk.page_content)
+        if start < 0:
+            continue
+        end = start + len(chunk.page_content)
+        chunk.metadata.update(
+            {
+                "start_index": start,
+                "end_index": end,
+                "start_line": bisect_right(line_starts, start),
+                "end_line": bisect_right(line_starts, max(end - 1, start)),
+            }
+        )
+        cursor = start + 1
+
+
+def has_span(doc: Document) -> bool:
+    return all(key in doc.metadata for key in SPAN_KEYS)
+
+
+def merge_spans(first: Document, second: Document) -> Optional[Tuple[str, dict]]:
+    """Join two chunks of one file whose spans overlap or touch"""
+    if first.metadata["start_index"] > second.metadata["start_index"]:
+        first, second = second, first
+    first_end = first.metadata["end_index"]
+    if second.metadata["start_index"] > first_end:
+        return None
+
+    text = first.page_content
+    if second.metadata["end_index"] > first_end:
+        text += second.page_content[first_end - second.metadata["start_index"] :]
+    span = {
+        "start_index": first.metadata["start_index"],
+        "end_index": max(first_end, second.metadata["end_index"]),
+        "start_line": first.metadata["start_line"],
+        "end_line": max(first.metadata["end_line"], second.metadata["end_line"]),
+    }
+    return text, span
+
+
+def coalesce_spans(docs: List[Document]) -> List[Document]:
+    """Merge overlapping chunks of the same file into non-overlapping spans.
+
+    A merged span takes the place of its best ranked chunk. Chunks without
+    span metadata pass through unchanged.
+    """
+    merged: List[Optional[Document]] = []
+    seen = set()
+    for doc in docs:
+        key = (doc.metadata.get("source"), doc.page_content)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        current, slot = doc, None
+        for i, other in enumerate(merged):
+            if (
+                other is None
+                or not (has_span(other) and has_span(current))
+                or other.metadata.get("source") != doc.metadata.get("source")
+            ):
+                continue
+            joined = merge_spans(other, current)
+            if joined is None:
+                continue
+            text, span = joined
+            current = Document(page_content=text, metadata={**other.metadata, **span})
+            current.metadata["token_count"] = CommonUtils.calculate_tokens(text)
+            if slot is None:
+                slot = i
+            else:
+                merged[i] = None
+
+        if slot is None:
+            merged.append(current)
+        else:
+            merged[slot] = current
+    return [doc for doc in merged if doc is not None]
+
+
+def span_label(doc: Document, default: str = "unknown") -> str:
+    """A chunk's file and, when known, its line range"""
+    source = doc.metadata.get("source", default)
+    if has_span(doc):
+        return (
+            f"{source} (lines {doc.metadata['start_line']}-{doc.metadata['end_line']})"
+        )
+    return source
+
+
+def span_header(doc: Document, default: str = "unknown") -> str:
+    return f"### {span_label(doc, default)}\n"
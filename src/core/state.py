@@ -1,26 +1,33 @@
-import operator
-from typing import TypedDict, Literal
-from langchain_core.documents import Document
+from typing import Any, Dict, TypedDict, Literal
 from typing import Annotated, List
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
 
+from config.settings import config
 from core.constants import TaskType
 
+_serde = JsonPlusSerializer()
+
 
 def overwrite_reducer(old_value, new_value):
     return new_value
 
 
-def append_reducer(old_value, new_value):
-    if isinstance(old_value, list):
-        old_value.append(new_value)
-        return old_value
-    return [old_value, new_value]
+def history_reducer(old_value, new_value):
+    """Append a node's new entries, keeping only the most recent ones"""
+    return (list(old_value or []) + list(new_value))[
+        -config.workflow.max_history_entries :
+    ]
 
 
 def increment_reducer(old_value, new_value):
     return old_value + new_value if isinstance(old_value, int) else new_value
 
 
+def state_size(values: Dict[str, Any]) -> int:
+    """Serialized size of state values as a checkpointer stores them"""
+    return sum(len(_serde.dumps_typed(value)[1] or b"") for value in values.values())
+
+
 class WorkflowState(TypedDict):
     instance_id: Annotated[str, overwrite_reducer]
     problem_stmt: Annotated[str, overwrite_reducer]
@@ -35,13 +42,14 @@ class WorkflowState(TypedDict):
         ],
         overwrite_reducer,
     ]
-    retrieved_docs: Annotated[List[Document], operator.add]
+    retrieved_chunk_ids: Annotated[List[str], overwrite_reducer]
     analysis: Annotated[str, overwrite_reducer]
-    analysis_history: Annotated[List[str], operator.add]
+    analysis_history: Annotated[List[str], history_reducer]
     generated_patch: Annotated[str, overwrite_reducer]
     analysis_attempts: Annotated[int, increment_reducer]
     review_retry_count: Annotated[int, increment_reducer]
     review_feedback: Annotated[str, overwrite_reducer]
     token_count: Annotated[int, increment_reducer]
-    edit_history: Annotated[List[dict], operator.add]
+    edit_history: Annotated[List[str], history_reducer]
+    edit_attempts: Annotated[int, increment_reducer]
     failure_reason: Annotated[str, overwrite_reducer]
@@ -0,0 +1,169 @@
+import ast
+import gzip
+import json
+import os
+import threading
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+Definition = Tuple[str, int, int]
+Reference = Tuple[str, int]
+
+# ast.parse is not thread-safe before CPython 3.11.8 and 3.12.1 (gh-106905)
+_parse_lock = threading.Lock()
+
+
+def module_name(path: str) -> str:
+    """Dotted module name of a repository file path"""
+    parts = path[: -len(Path(path).suffix) or None].split("/")
+    if parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def extract_symbols(source_text: str, path: str) -> Optional[dict]:
+    """Collect definitions, imports and call sites of a Python file.
+
+    Definitions are ``[qualname, kind, start_line, end_line]`` with decorators
+    included in the span, calls are ``[name, line]`` keyed by the called
+    attribute or function name, and relative imports are resolved against the
+    file's package. Returns None for files that do not parse.
+    """
+    try:
+        with _parse_lock:
+            tree = ast.parse(source_text)
+    except (SyntaxError, ValueError, RecursionError) as e:
+        logger.debug(f"Skipping symbols of {path}: {str(e)}")
+        return None
+
+    package = module_name(path).split(".")
+    if not path.endswith("__init__.py"):
+        package = package[:-1]
+    defs, imports, calls = [], [], []
+
+    def visit(node: ast.AST, scope: str):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                name = f"{scope}.{child.name}" if scope else child.name
+                start = min([d.lineno for d in child.decorator_list] + [child.lineno])
+                kind = "class" if isinstance(child, ast.ClassDef) else "def"
+                defs.append([name, kind, start, child.end_lineno])
+                visit(child, name)
+                continue
+            if isinstance(child, ast.Call):
+                func = child.func
+                if isinstance(func, ast.Name):
+                    calls.append([func.id, child.lineno])
+                elif isinstance(func, ast.Attribute):
+                    calls.append([func.attr, child.lineno])
+            elif isinstance(child, ast.Import):
+                imports.extend(alias.name for alias in child.names)
+            elif isinstance(child, ast.ImportFrom):
+                base = package[: len(package) - child.level + 1] if child.level else []
+                module = ".".join(base + ([child.module] if child.module else []))
+                imports.extend(
+                    f"{module}.{alias.name}" if module else alias.name
+                    for alias in child.names
+                )
+            visit(child, scope)
+
+    try:
+        visit(tree, "")
+    except RecursionError:
+        logger.debug(f"Skipping symbols of {path}: nesting too deep")
+        return None
+    return {"defs": defs, "imports": imports, "calls": calls}
+
+
+class SymbolIndex:
+    """Where a commit's classes and functions are defined, imported and called.
+
+    Per-file symbols come from ``extract_symbols`` during ingestion and are
+    stored with their blob hash, so unchanged files can be carried over to
+    other commits. Loading builds dictionaries from bare names, qualified names
+    and module-qualified names to definition spans, from called names to call
+    sites, and from imported modules and names to the files importing them.
+    """
+
+    SYMBOLS_FILE = "symbols.json.gz"
+    VERSION = 1
+
+    def __init__(self, files: Dict[str, dict]):
+        self.files = files
+        self.definitions: Dict[str, List[Definition]] = defaultdict(list)
+        self.callers: Dict[str, List[Reference]] = defaultdict(list)
+        self.importers: Dict[str, List[str]] = defaultdict(list)
+        for path in sorted(files):
+            self._add(path, files[path])
+
+    def _add(self, path: str, entry: dict):
+        module = module_name(path)
+        for name, _, start, end in entry["defs"]:
+            location = (path, start, end)
+            keys = {name, name.rsplit(".", 1)[-1], f"{module}.{name}"}
+            for key in keys:
+                self.definitions[key].append(location)
+        for name, line in entry["calls"]:
+            self.callers[name].append((path, line))
+        prefixes = set()
+        for name in entry["imports"]:
+            parts = name.split(".")
+            prefixes.update(".".join(parts[: i + 1]) for i in range(len(parts)))
+        for prefix in prefixes:
+            self.importers[prefix].append(path)
+
+    def lookup(self, name: str) -> List[Definition]:
+        """Definitions of a name, dropping leading qualifiers until one matches"""
+        parts = name.strip("()").split(".")
+        for i in range(len(parts)):
+            locations = self.definitions.get(".".join(parts[i:]))
+            if locations:
+                return locations
+        return []
+
+    def callers_of(self, name: str, path: Optional[str] = None) -> List[Reference]:
+        """Call sites of a name, those in files that import path's module first"""
+        short_name = name.strip("()").rsplit(".", 1)[-1]
+        sites = [site for site in self.callers.get(short_name, []) if site[0] != path]
+        if path is None:
+            return sites
+        related = set(self.importers.get(module_name(path), []))
+        return sorted(sites, key=lambda site: site[0] not in related)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["SymbolIndex"]:
+        """Read a saved index, or return None if it is missing or outdated"""
+        file_path = Path(path) / cls.SYMBOLS_FILE
+        if not file_path.exists():
+            return None
+        try:
+            with gzip.open(file_path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable symbol index {file_path}: {e}")
+            return None
+        if data.get("version") != cls.VERSION:
+            return None
+        return cls(data["files"])
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        file_path = path / self.SYMBOLS_FILE
+        tmp_path = path / f".{self.SYMBOLS_FILE}.{uuid.uuid4().hex}"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=1) as f:
+                json.dump(
+                    {"version": self.VERSION, "files": self.files},
+                    f,
+                    separators=(",", ":"),
+                )
+            os.replace(tmp_path, file_path)
+        except OSError as e:
+            logger.warning(f"Could not save symbol index {file_path}: {str(e)}")
+            tmp_path.unlink(missing_ok=True)
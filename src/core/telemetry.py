@@ -0,0 +1,420 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from uuid import UUID
+from pydantic import BaseModel
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables.config import var_child_runnable_config
+from config.settings import config
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import trace as otel_trace
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+        OTLPSpanExporter,
+    )
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+except ImportError:
+    otel_trace = None
+
+_current_trace: ContextVar[Optional["InstanceTrace"]] = ContextVar(
+    "telemetry_trace", default=None
+)
+
+
+class Span(BaseModel):
+    instance_id: str
+    kind: str
+    name: str
+    node: Optional[str] = None
+    start: float
+    duration: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cache_hits: int = 0
+    retries: int = 0
+    error: Optional[str] = None
+
+
+def record_embedding(
+    name: str, started: float, tokens: int = 0, cache_hits: int = 0, retries: int = 0
+):
+    """Add an embedding request or cache lookup to the current instance's trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(
+            "embedding",
+            name,
+            started,
+            prompt_tokens=tokens,
+            cache_hits=cache_hits,
+            retries=retries,
+        )
+
+
+def record_llm_request(request: Any = None):
+    """Count an HTTP attempt of the current node's LLM call as an httpx hook.
+
+    Provider SDKs retry inside a single LangChain run, so every attempt after
+    the first one of an open LLM span is recorded as one of its retries.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.count_attempt(_current_node())
+
+
+async def arecord_llm_request(request: Any = None):
+    record_llm_request(request)
+
+
+def record_llm_cache_hit():
+    """Mark the current node's LLM call as answered by the response cache"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.count_cache_hit(_current_node())
+
+
+def _current_node() -> Optional[str]:
+    metadata = (var_child_runnable_config.get() or {}).get("metadata") or {}
+    return metadata.get("langgraph_node")
+
+
+@contextmanager
+def timed(kind: str, name: str) -> Iterator[None]:
+    """Record the wall time of a block in the current instance's trace"""
+    started = time.time()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = repr(e)
+        raise
+    finally:
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(kind, name, started, error=error)
+
+
+class InstanceTrace(BaseCallbackHandler):
+    """Callback handler collecting the spans of one instance.
+
+    Graph nodes and LLM calls are timed from LangChain callbacks, with token
+    counts taken from the provider's usage metadata. Responses the LLM cache
+    reports through ``record_llm_cache_hit`` are counted as cache hits
+    instead of tokens. LLM retries come from ``with_retry`` callbacks and
+    from SDK requests counted by ``record_llm_request``. Embedding wrappers
+    add their requests through ``record_embedding``.
+    """
+
+    run_inline = True
+
+    def __init__(self, instance_id: str):
+        self.instance_id = instance_id
+        self.spans: List[Span] = []
+        self._started = time.time()
+        self._graph_runs: set = set()
+        self._open: Dict[UUID, Tuple[str, str, Optional[str], float]] = {}
+        self._retries: Dict[UUID, int] = defaultdict(int)
+        self._attempted: set = set()
+        self._cached: set = set()
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, name: str, started: float, **fields: Any):
+        span = Span(
+            instance_id=self.instance_id,
+            kind=kind,
+            name=name,
+            start=started,
+            duration=time.time() - started,
+            **fields,
+        )
+        with self._lock:
+            self.spans.append(span)
+
+    def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ):
+        if parent_run_id is None:
+            self._graph_runs.add(run_id)
+            return
+        node = (metadata or {}).get("langgraph_node")
+        # Nodes are the graph's direct children; their inner runnables are not
+        if parent_run_id in self._graph_runs and kwargs.get("name") == node:
+            if not node.startswith("__"):
+                self._open[run_id] = ("node", node, node, time.time())
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any):
+        self._close(run_id)
+        self._graph_runs.discard(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._close(run_id, error=repr(error))
+        self._graph_runs.discard(run_id)
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[Any]],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ):
+        self._start_llm(serialized, run_id, metadata)
+
+    def on_llm_start(
+        self,
+        serialized: Dict[str, Any],
+        prompts: List[str],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ):
+        self._start_llm(serialized, run_id, metadata)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        with self._lock:
+            cached = run_id in self._cached
+        if cached:
+            self._close(run_id, cache_hits=1)
+            return
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = (
+                    getattr(
+                        getattr(generation, "message", None), "usage_metadata", None
+                    )
+                    or {}
+                )
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+        if not (prompt_tokens or completion_tokens):
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+        self._close(
+            run_id,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._close(run_id, error=repr(error))
+
+    def on_retry(self, retry_state: Any, *, run_id: UUID, **kwargs: Any):
+        self._retries[run_id] += 1
+
+    def count_attempt(self, node: Optional[str]):
+        """Record a request of the node's latest open LLM run"""
+        run_id = self._latest_llm_run(node)
+        if run_id is None:
+            return
+        with self._lock:
+            if run_id in self._attempted:
+                self._retries[run_id] += 1
+            else:
+                self._attempted.add(run_id)
+
+    def count_cache_hit(self, node: Optional[str]):
+        """Record that the node's latest open LLM run was served from cache"""
+        run_id = self._latest_llm_run(node)
+        if run_id is not None:
+            with self._lock:
+                self._cached.add(run_id)
+
+    def _latest_llm_run(self, node: Optional[str]) -> Optional[UUID]:
+        runs = [
+            (started, run_id)
+            for run_id, (kind, _, run_node, started) in list(self._open.items())
+            if kind == "llm" and run_node == node
+        ]
+        return max(runs)[1] if runs else None
+
+    def _start_llm(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]],
+    ):
+        name = (serialized or {}).get("name") or "llm"
+        node = (metadata or {}).get("langgraph_node")
+        self._open[run_id] = ("llm", name, node, time.time())
+
+    def _close(self, run_id: UUID, **fields: Any):
+        opened = self._open.pop(run_id, None)
+        if opened is None:
+            return
+        kind, name, node, started = opened
+        with self._lock:
+            retries = self._retries.pop(run_id, 0)
+            self._attempted.discard(run_id)
+            self._cached.discard(run_id)
+        self.add(kind, name, started, node=node, retries=retries, **fields)
+
+    def summary_span(self, error: Optional[str] = None) -> Span:
+        """Totals of the instance, as one span covering its whole run"""
+        spans = [span for span in self.spans if span.kind != "node"]
+        return Span(
+            instance_id=self.instance_id,
+            kind="instance",
+            name=self.instance_id,
+            start=self._started,
+            duration=time.time() - self._started,
+            prompt_tokens=sum(span.prompt_tokens for span in spans),
+            completion_tokens=sum(span.completion_tokens for span in spans),
+            cache_hits=sum(span.cache_hits for span in spans),
+            retries=sum(span.retries for span in spans),
+            error=error,
+        )
+
+
+class Telemetry:
+    """Collects instance traces of a run and aggregates them by node.
+
+    Each instance's spans are appended to ``<traces_dir>/<instance_id>.jsonl``
+    when it finishes, and exported over OTLP when an endpoint is configured
+    and the OpenTelemetry SDK is installed.
+    """
+
+    def __init__(
+        self,
+        traces_dir: Optional[Path] = None,
+        otlp_endpoint: Optional[str] = None,
+    ):
+        settings = config.telemetry
+        self.enabled = settings.enabled
+        self.traces_dir = Path(traces_dir or settings.traces_dir)
+        self.totals: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self._lock = threading.Lock()
+        self._tracer = self._initialize_tracer(otlp_endpoint or settings.otlp_endpoint)
+
+    @staticmethod
+    def _initialize_tracer(endpoint: Optional[str]):
+        if not endpoint:
+            return None
+        if otel_trace is None:
+            logger.warning(
+                "OpenTelemetry export needs opentelemetry-sdk and "
+                "opentelemetry-exporter-otlp-proto-http; exporting JSONL only"
+            )
+            return None
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": "swe-bench-agent"})
+        )
+        provider.add_span_processor(
+            BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint))
+        )
+        return provider.get_tracer(__name__)
+
+    @contextmanager
+    def instance(self, instance_id: str) -> Iterator[Optional[InstanceTrace]]:
+        """Trace everything run for an instance within the block"""
+        if not self.enabled:
+            yield None
+            return
+        trace = InstanceTrace(instance_id)
+        token = _current_trace.set(trace)
+        error = None
+        try:
+            yield trace
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            _current_trace.reset(token)
+            self._finish(trace, error)
+
+    def _finish(self, trace: InstanceTrace, error: Optional[str]):
+        spans = sorted(trace.spans, key=lambda span: span.start)
+        spans.append(trace.summary_span(error))
+        with self._lock:
+            for span in spans:
+                name = "all instances" if span.kind == "instance" else span.name
+                totals = self.totals[(span.kind, span.node or name)]
+                totals["calls"] += 1
+                totals["seconds"] += span.duration
+                totals["prompt_tokens"] += span.prompt_tokens
+                totals["completion_tokens"] += span.completion_tokens
+                totals["cache_hits"] += span.cache_hits
+                totals["retries"] += span.retries
+                totals["errors"] += span.error is not None
+        self._write(trace.instance_id, spans)
+        if self._tracer is not None:
+            self._export(spans)
+
+    def _write(self, instance_id: str, spans: List[Span]):
+        try:
+            self.traces_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.traces_dir / f"{instance_id}.jsonl", "a") as f:
+                f.writelines(span.model_dump_json() + "\n" for span in spans)
+        except OSError as e:
+            logger.warning(f"Could not write trace of {instance_id}: {str(e)}")
+
+    def _export(self, spans: List[Span]):
+        """Send spans over OTLP as children of the instance's span"""
+        root, children = spans[-1], spans[:-1]
+        root_span = self._tracer.start_span(
+            f"instance {root.name}",
+            start_time=int(root.start * 1e9),
+            attributes=self._attributes(root),
+        )
+        context = otel_trace.set_span_in_context(root_span)
+        for span in children:
+            name = f"{span.kind} {span.name}"
+            if span.kind == "llm" and span.node:
+                name = f"llm {span.node}"
+            child = self._tracer.start_span(
+                name,
+                context=context,
+                start_time=int(span.start * 1e9),
+                attributes=self._attributes(span),
+            )
+            child.end(end_time=int((span.start + span.duration) * 1e9))
+        root_span.end(end_time=int((root.start + root.duration) * 1e9))
+
+    @staticmethod
+    def _attributes(span: Span) -> Dict[str, Any]:
+        attributes = span.model_dump(exclude={"start", "duration"}, exclude_none=True)
+        return {f"swe.{key}": value for key, value in attributes.items()}
+
+    def summary(self) -> str:
+        """Table of calls, time, tokens, cache hits and retries by node"""
+        rows = sorted(
+            self.totals.items(),
+            key=lambda item: (item[0][0] == "instance", -item[1]["seconds"]),
+        )
+        lines = [
+            f"{'kind':<10} {'name':<28} {'calls':>6} {'total s':>9} {'mean s':>8} "
+            f"{'prompt':>9} {'output':>8} {'cached':>7} {'retries':>8} {'errors':>7}"
+        ]
+        for (kind, name), totals in rows:
+            calls = int(totals["calls"])
+            lines.append(
+                f"{kind:<10} {name[:28]:<28} {calls:>6} {totals['seconds']:>9.2f} "
+                f"{totals['seconds'] / max(calls, 1):>8.3f} "
+                f"{int(totals['prompt_tokens']):>9} "
+                f"{int(totals['completion_tokens']):>8} "
+                f"{int(totals['cache_hits']):>7} {int(totals['retries']):>8} "
+                f"{int(totals['errors']):>7}"
+            )
+        return "\n".join(lines)
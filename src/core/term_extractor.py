@@ -0,0 +1,146 @@
+import keyword
+import re
+from collections import defaultdict
+from config.settings import config
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LocalTermExtractor:
+    """Pulls code terms out of problem statements without calling an LLM.
+
+    Traceback frames, exception names, file names, dotted paths, backticked
+    code and identifier-shaped words are picked up by regexes, in that order
+    of priority. File names must resolve to a file of the repository and other
+    terms must consist of tokens that occur in the indexed code.
+    """
+
+    FRAME = re.compile(r'File "([^"]+)", line (\d+), in ([\w<>]+)')
+    EXCEPTION = re.compile(
+        r"\b([A-Z]\w*(?:Error|Exception|Warning|Exit|Interrupt|DoesNotExist))\b"
+    )
+    BACKTICK = re.compile(r"`+([^`\n]+?)`+")
+    DOTTED = re.compile(r"\b[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)+\b")
+    CALL = re.compile(r"\b([A-Za-z_]\w*)\(")
+    IDENTIFIER = re.compile(
+        r"\b(?:_+[A-Za-z]\w*|[A-Za-z]\w*_\w*[A-Za-z0-9]|[A-Z][a-z0-9]+[A-Z]\w*"
+        r"|[a-z][a-z0-9]*[A-Z]\w*)\b"
+    )
+    TOKEN = re.compile(r"\w+")
+    IGNORED = {"self", "cls", "args", "kwargs"}
+    MIN_LENGTH = 3
+
+    def __init__(
+        self,
+        paths: Iterable[str],
+        has_terms: Callable[[List[str]], List[bool]],
+        max_terms: Optional[int] = None,
+    ):
+        self.paths = set(paths)
+        self.has_terms = has_terms
+        self.max_terms = max_terms or config.retrieval.max_key_terms
+        self._by_name: Dict[str, List[str]] = defaultdict(list)
+        for path in self.paths:
+            self._by_name[path.rsplit("/", 1)[-1]].append(path)
+        extensions = "|".join(
+            re.escape(ext.lstrip(".")) for ext in config.retrieval.relevant_extensions
+        )
+        self._file = re.compile(
+            rf"(?<![\w.-])((?:[\w.-]+/)*[\w-]+\.(?:{extensions}))\b"
+        )
+
+    def extract(self, problem: str, feedback: str = "") -> List[str]:
+        """Return validated key terms, most specific kinds first"""
+        files, candidates, prose = [], [], []
+        for text in (problem, feedback):
+            if not text:
+                continue
+            for path, _, function in self.FRAME.findall(text):
+                # Frames outside the repository are library noise
+                if self._resolve_path(path):
+                    files.append(path)
+                    candidates.append(function)
+            files.extend(self._file.findall(text))
+            prose.append(self._file.sub(" ", self.FRAME.sub(" ", text)))
+
+        for text in prose:
+            candidates.extend(self.EXCEPTION.findall(text))
+            for code in self.BACKTICK.findall(text):
+                candidates.extend(self._code_terms(code))
+            candidates.extend(self._code_terms(text))
+
+        terms = [path for path in map(self._resolve_path, files) if path]
+        terms.extend(self._known(candidates))
+        terms = self._unique(terms)[: self.max_terms]
+        logger.debug(f"Extracted key terms: {terms}")
+        return terms
+
+    def frames(self, problem: str, feedback: str = "") -> List[Tuple[str, int]]:
+        """Repository files and lines of traceback frames, innermost first"""
+        frames = []
+        for text in (problem, feedback):
+            for path, line, _ in reversed(self.FRAME.findall(text or "")):
+                path = self._resolve_path(path)
+                if path in self.paths:
+                    frames.append((path, int(line)))
+        return frames
+
+    def _code_terms(self, text: str) -> List[str]:
+        """Dotted paths, called names and identifier-shaped words of text"""
+        terms = [
+            dotted
+            for dotted in self.DOTTED.findall(text)
+            if not self._file.fullmatch(dotted)
+        ]
+        terms.extend(self.CALL.findall(text))
+        terms.extend(self.IDENTIFIER.findall(text))
+        return terms
+
+    def _resolve_path(self, path: str) -> Optional[str]:
+        """Map a mentioned or absolute path onto a repository file"""
+        path = path.replace("\\", "/").lstrip("/")
+        # Strip "./" prefixes only; dot-named files and "../" must survive
+        while path.startswith("./"):
+            path = path[2:]
+        if path in self.paths:
+            return path
+        matches = [
+            known
+            for known in self._by_name.get(path.rsplit("/", 1)[-1], [])
+            if known.endswith("/" + path) or path.endswith("/" + known)
+        ]
+        if len(matches) == 1:
+            return matches[0]
+        # An ambiguous bare file name is still a useful query term
+        return path if matches else None
+
+    def _known(self, candidates: List[str]) -> List[str]:
+        """Keep candidates whose tokens all occur in the indexed code"""
+        candidates = [
+            term
+            for term in self._unique(candidates)
+            if len(term) >= self.MIN_LENGTH
+            and term not in self.IGNORED
+            and not keyword.iskeyword(term)
+        ]
+        tokens = sorted({token for term in candidates for token in self._tokens(term)})
+        known = {token for token, found in zip(tokens, self.has_terms(tokens)) if found}
+        return [
+            term
+            for term in candidates
+            if all(token in known for token in self._tokens(term))
+        ]
+
+    def _tokens(self, term: str) -> List[str]:
+        return [token.lower() for token in self.TOKEN.findall(term)]
+
+    @staticmethod
+    def _unique(terms: List[str]) -> List[str]:
+        seen, unique = set(), []
+        for term in terms:
+            if term.lower() not in seen:
+                seen.add(term.lower())
+                unique.append(term)
+        return unique
@@ -1,6 +1,9 @@
 import json
+import os
+import threading
+import uuid
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional
 from config.settings import config
 import logging
 
@@ -8,60 +11,123 @@ logger = logging.getLogger(__name__)
 
 
 class PredictionStore:
-    """Handles storage and retrieval of prediction results"""
+    """Handles storage and retrieval of prediction results.
+
+    Predictions are appended to a ``.jsonl`` journal next to the predictions
+    file and fsynced one by one, so a crash loses at most the instance in
+    flight. ``save`` exports the journal to the JSON layout the SWE-bench
+    harness reads.
+    """
 
     def __init__(self, file_path: Optional[Path] = None):
-        self.file_path = file_path or config.evaluation.predictions_path
-        self._predictions: List[Dict] = []
+        self.file_path = Path(file_path or config.evaluation.predictions_path)
+        self.journal_path = self.file_path.with_suffix(".jsonl")
         self._loaded_ids = set()
+        self._lock = threading.Lock()
         self._initialize_storage()
 
     def _initialize_storage(self):
-        """Load existing predictions and prepare storage directory"""
+        """Load existing prediction ids and prepare storage directory"""
         self.file_path.parent.mkdir(parents=True, exist_ok=True)
 
-        if self.file_path.exists():
-            try:
-                with open(self.file_path, "r") as f:
-                    existing = json.load(f)
-                    self._predictions = existing
-                    self._loaded_ids = {p["instance_id"] for p in existing}
-                    logger.info(f"Loaded {len(existing)} existing predictions")
-            except (json.JSONDecodeError, IOError) as e:
-                logger.error(f"Failed loading predictions: {str(e)}")
-                self._predictions = []
+        if not self.journal_path.exists() and self.file_path.exists():
+            self._migrate_json()
+
+        if self.journal_path.exists():
+            self._scan_journal()
+            logger.info(f"Loaded {len(self._loaded_ids)} existing predictions")
+
+    def _migrate_json(self):
+        """Seed the journal from a predictions file written by an older run"""
+        try:
+            with open(self.file_path, "r") as f:
+                existing = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Failed loading predictions: {str(e)}")
+            return
+
+        self._write_journal(existing)
+        logger.info(f"Migrated {len(existing)} predictions to {self.journal_path}")
+
+    def _scan_journal(self):
+        """Collect instance ids line by line, dropping a torn final record"""
+        valid_end = 0
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # An interrupted append leaves a partial last line behind
+                    logger.warning(f"Truncating partial record in {self.journal_path}")
+                    break
+                valid_end += len(line)
+                try:
+                    self._loaded_ids.add(json.loads(line)["instance_id"])
+                except (ValueError, KeyError, TypeError):
+                    logger.warning(f"Skipping corrupt line in {self.journal_path}")
+
+        if valid_end < self.journal_path.stat().st_size:
+            os.truncate(self.journal_path, valid_end)
 
     def add_prediction(self, prediction: Dict):
-        """Add a new prediction to the store"""
+        """Append a new prediction to the journal and flush it to disk"""
         if not self._is_valid_prediction(prediction):
             logger.error(
                 f"Invalid prediction format for prediction {prediction}, skipping"
             )
             return
 
-        if prediction["instance_id"] in self._loaded_ids:
-            logger.warning(f"Duplicate prediction for {prediction['instance_id']}")
-            return
+        line = json.dumps(prediction) + "\n"
+        with self._lock:
+            if prediction["instance_id"] in self._loaded_ids:
+                logger.warning(f"Duplicate prediction for {prediction['instance_id']}")
+                return
 
-        self._predictions.append(prediction)
-        self._loaded_ids.add(prediction["instance_id"])
+            with open(self.journal_path, "a") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._loaded_ids.add(prediction["instance_id"])
         logger.debug(f"Added prediction for {prediction['instance_id']}")
 
     def save(self):
-        """Persist predictions to disk"""
+        """Export the journal to the JSON predictions file"""
         try:
-            with open(self.file_path, "w") as f:
-                json.dump(self._predictions, f, indent=2)
-                logger.info(
-                    f"Saved {len(self._predictions)} predictions to {self.file_path}"
+            with self._lock:
+                predictions = list(self.iter_predictions())
+                self._atomic_write(
+                    self.file_path, lambda f: json.dump(predictions, f, indent=2)
                 )
+            logger.info(f"Saved {len(predictions)} predictions to {self.file_path}")
         except IOError as e:
             logger.error(f"Failed saving predictions: {str(e)}")
             raise
 
+    def compact(self):
+        """Rewrite the journal without duplicate or corrupt records"""
+        with self._lock:
+            seen = set()
+            predictions = []
+            for prediction in self.iter_predictions():
+                if prediction["instance_id"] not in seen:
+                    seen.add(prediction["instance_id"])
+                    predictions.append(prediction)
+            self._write_journal(predictions)
+            self._loaded_ids = seen
+        logger.info(f"Compacted {self.journal_path} to {len(predictions)} predictions")
+
+    def iter_predictions(self) -> Iterator[Dict]:
+        """Stream stored predictions from the journal"""
+        if not self.journal_path.exists():
+            return
+        with open(self.journal_path, "r") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
     def get_predictions(self) -> List[Dict]:
         """Return all stored predictions"""
-        return self._predictions.copy()
+        return list(self.iter_predictions())
 
     def get_processed_ids(self) -> set:
         """Return set of already processed instance IDs"""
@@ -76,8 +142,27 @@ class PredictionStore:
         }
         return all(key in prediction for key in required_keys)
 
+    def _write_journal(self, predictions: List[Dict]):
+        def write(f):
+            for prediction in predictions:
+                f.write(json.dumps(prediction) + "\n")
+
+        self._atomic_write(self.journal_path, write)
+
+    def _atomic_write(self, path: Path, write):
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        try:
+            with open(tmp_path, "w") as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
     def clear(self):
         """Clear all stored predictions (for testing)"""
-        self._predictions.clear()
-        self._loaded_ids.clear()
+        with self._lock:
+            self.journal_path.unlink(missing_ok=True)
+            self._loaded_ids.clear()
         logger.warning("Cleared all predictions from store")
@@ -11,6 +11,8 @@ def update_config_from_args(args):
     config.evaluation.predictions_path = Path(args.predictions_path)
     config.models.llm_model = args.llm_model
     config.models.embeddings_model = args.embeddings_model
+    config.evaluation.max_workers = args.max_workers
+    config.workflow.async_execution = args.async_execution
 
 
 if __name__ == "__main__":
@@ -41,6 +43,17 @@ if __name__ == "__main__":
         default=config.models.embeddings_model,
         help="Specify the model used for embeddings generation. Default value is text-embedding-3-small",
     )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=config.evaluation.max_workers,
+        help="Number of instances processed concurrently. Default value is 4",
+    )
+    parser.add_argument(
+        "--async-execution",
+        action="store_true",
+        help="Run agents with asyncio on a single event loop instead of threads",
+    )
 
     args = parser.parse_args()
     update_config_from_args(args)
@@ -1,10 +1,19 @@
+import hashlib
+import threading
 import tiktoken
 import re
+from array import array
+from collections import OrderedDict
 from config.settings import config
+from typing import List, Optional, Sequence
 
 
 class CommonUtils:
     _encoders = {}
+    # Token arrays keyed by (encoding name, content digest), least recent first
+    _token_memo: "OrderedDict[tuple, array]" = OrderedDict()
+    _token_memo_size = 0
+    _token_memo_lock = threading.Lock()
 
     @classmethod
     def get_encoder(cls, model_name: str = None):
@@ -19,32 +28,98 @@ class CommonUtils:
                 cls._encoders[model_name] = tiktoken.get_encoding("cl100k_base")
         return cls._encoders[model_name]
 
+    @classmethod
+    def encode(cls, text: str, model_name: str = None) -> Sequence[int]:
+        """Return the memoized token array of text"""
+        return cls.encode_batch([text], model_name)[0]
+
+    @classmethod
+    def encode_batch(cls, texts: List[str], model_name: str = None) -> List[array]:
+        """Tokenize texts, encoding only unseen contents in a single batch"""
+        encoder = cls.get_encoder(model_name)
+        keys = [
+            (
+                encoder.name,
+                hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest(),
+            )
+            for text in texts
+        ]
+        results: List[Optional[array]] = []
+        with cls._token_memo_lock:
+            for key in keys:
+                tokens = cls._token_memo.get(key)
+                if tokens is not None:
+                    cls._token_memo.move_to_end(key)
+                results.append(tokens)
+
+        missing = {}
+        for key, text, tokens in zip(keys, texts, results):
+            if tokens is None:
+                missing.setdefault(key, text)
+        if not missing:
+            return results
+
+        encoded = dict(
+            zip(
+                missing,
+                (
+                    array("I", tokens)
+                    for tokens in encoder.encode_batch(
+                        list(missing.values()), disallowed_special=()
+                    )
+                ),
+            )
+        )
+        cls._remember(encoded)
+        return [
+            encoded[key] if tokens is None else tokens
+            for key, tokens in zip(keys, results)
+        ]
+
+    @classmethod
+    def _remember(cls, encoded: dict):
+        limit = config.cache.token_memo_max_tokens
+        with cls._token_memo_lock:
+            for key, tokens in encoded.items():
+                if key not in cls._token_memo and len(tokens) <= limit:
+                    cls._token_memo[key] = tokens
+                    cls._token_memo_size += len(tokens)
+            while cls._token_memo_size > limit:
+                _, evicted = cls._token_memo.popitem(last=False)
+                cls._token_memo_size -= len(evicted)
+
     @classmethod
     def truncate_text(
         cls, text: str, max_tokens: int, max_chars: int = None, model_name: str = None
     ) -> str:
         if not text:
             return text
-        encoder = cls.get_encoder(model_name)
-        tokens = encoder.encode(text)
-        truncated_tokens = tokens[:max_tokens]
-        truncated_text = encoder.decode(truncated_tokens)
+        tokens = cls.encode(text, model_name)
+        if len(tokens) > max_tokens:
+            truncated_text = cls.get_encoder(model_name).decode(tokens[:max_tokens])
+        else:
+            # Decoding all tokens would only reproduce the text
+            truncated_text = text
 
         # Apply character-level truncation if needed
-        if max_chars is not None:
-            if len(truncated_text) > max_chars:
-                truncated_chars = truncated_text[:max_chars]
-                valid_tokens = encoder.encode(truncated_chars)
-                truncated_text = encoder.decode(valid_tokens)
+        if max_chars is not None and len(truncated_text) > max_chars:
+            truncated_text = truncated_text[:max_chars]
 
         if len(tokens) > max_tokens or (max_chars and len(truncated_text) < len(text)):
             truncated_text = truncated_text.rstrip() + "..."
 
         return truncated_text
 
+    @classmethod
+    def truncate_tokens(
+        cls, tokens: Sequence[int], max_tokens: int, model_name: str = None
+    ) -> str:
+        """Decode at most max_tokens of an already encoded text"""
+        return cls.get_encoder(model_name).decode(tokens[:max_tokens])
+
     @classmethod
     def calculate_tokens(cls, text: str, model_name: str = None) -> int:
-        return len(cls.get_encoder(model_name).encode(text))
+        return len(cls.encode(text, model_name))
 
     @classmethod
     def classify_problem(cls, problem_stmt: str) -> str:
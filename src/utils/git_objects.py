@@ -0,0 +1,104 @@
+import subprocess
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class GitObjectReader:
+    """Reads object contents through a long-lived ``git cat-file --batch``.
+
+    Objects are addressed by blob hash or by ``<commit>:<path>``, so files can
+    be read at any commit without a working tree. Batched reads pipeline their
+    requests to keep the process busy.
+    """
+
+    def __init__(self, repo_path: str):
+        self.repo_path = Path(repo_path)
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "GitObjectReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read(self, rev: str) -> Optional[bytes]:
+        """Return the contents of an object, or None if it does not exist"""
+        with self._lock:
+            process = self._start()
+            process.stdin.write(rev.encode("utf-8") + b"\n")
+            process.stdin.flush()
+            return self._read_response(process)
+
+    def read_file(self, commit: str, path: str) -> Optional[bytes]:
+        """Return a file's contents at a commit"""
+        return self.read(f"{commit}:{path}")
+
+    def iter_read(self, revs: Iterable[str]) -> Iterator[Tuple[str, Optional[bytes]]]:
+        """Yield (rev, contents) in request order"""
+        revs = list(revs)
+        with self._lock:
+            process = self._start()
+            writer = threading.Thread(
+                target=self._write_requests, args=(process, revs), daemon=True
+            )
+            writer.start()
+            read = 0
+            try:
+                for rev in revs:
+                    contents = self._read_response(process)
+                    read += 1
+                    yield rev, contents
+            finally:
+                if read < len(revs):
+                    # Unread responses would desync the stream, so start over
+                    self._stop()
+                writer.join()
+
+    def close(self):
+        with self._lock:
+            self._stop()
+
+    def _start(self) -> subprocess.Popen:
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                ["git", "cat-file", "--batch"],
+                cwd=self.repo_path,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+        return self._process
+
+    def _stop(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+
+    @staticmethod
+    def _write_requests(process: subprocess.Popen, revs: Iterable[str]):
+        try:
+            for rev in revs:
+                process.stdin.write(rev.encode("utf-8") + b"\n")
+            process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    @staticmethod
+    def _read_response(process: subprocess.Popen) -> Optional[bytes]:
+        header = process.stdout.readline()
+        if not header:
+            raise RuntimeError("git cat-file exited unexpectedly")
+        parts = header.split()
+        if len(parts) != 3:
+            logger.debug(f"Object not found: {header.decode('utf-8', 'replace')}")
+            return None
+
+        size = int(parts[2])
+        contents = process.stdout.read(size)
+        process.stdout.read(1)
+        return contents
@@ -1,28 +1,55 @@
-from pathlib import Path
+from pathlib import PurePosixPath
 from git import Repo
 from config.settings import config
+from typing import Dict, Iterable, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def setup_repository(repo_url: str, commit_hash: str) -> str:
-    """Clone repository and checkout specific commit"""
-    repo_name = repo_url.replace("/", "__")
-    repo_dir = Path(config.repo_clone_path) / repo_name
+def resolve_commit(repo_path: str, commit: str = "HEAD") -> str:
+    """Resolve a revision to its full commit hash"""
+    return Repo(str(repo_path)).commit(commit).hexsha
 
-    try:
-        if not repo_dir.exists():
-            logger.info(f"Cloning {repo_url} to {repo_dir}")
-            Repo.clone_from(f"https://github.com/{repo_url}.git", str(repo_dir))
 
-        repo = Repo(str(repo_dir))
-        if repo.head.commit.hexsha != commit_hash:
-            logger.info(f"Checking out commit {commit_hash}")
-            repo.git.checkout(commit_hash)
+def list_source_blobs(
+    repo_path: str,
+    commit: str,
+    suffixes: Optional[Iterable[str]] = None,
+    exclude: Optional[Iterable[str]] = None,
+) -> Dict[str, str]:
+    """Map relevant file paths at a commit to their git blob hashes"""
+    suffixes = tuple(suffixes or config.retrieval.relevant_extensions)
+    exclude = tuple(exclude or config.retrieval.exclude_patterns)
+    repo = Repo(str(repo_path))
+    output = repo.git.ls_tree("-r", "-z", "--full-tree", commit)
 
-        return str(repo_dir)
+    blobs = {}
+    for entry in output.split("\0"):
+        if not entry:
+            continue
+        meta, path = entry.split("\t", 1)
+        mode, obj_type, sha = meta.split()
+        if obj_type != "blob" or mode == "120000":
+            continue
+        # Match against an absolute-style path so root-level files behave
+        # the same as with the filesystem loader's exclude globs
+        posix_path = PurePosixPath("/", path)
+        if posix_path.suffix not in suffixes:
+            continue
+        if any(posix_path.match(pattern) for pattern in exclude):
+            continue
+        blobs[path] = sha
+    return blobs
 
-    except Exception as e:
-        logger.error(f"Repository setup failed: {str(e)}")
-        raise
+
+def commit_timestamps(repo_path: str, commits: Iterable[str]) -> Dict[str, int]:
+    """Return committer timestamps for commits known to the repository"""
+    repo = Repo(str(repo_path))
+    timestamps = {}
+    for commit in commits:
+        try:
+            timestamps[commit] = repo.commit(commit).committed_date
+        except Exception:
+            logger.debug(f"Commit {commit} not found in {repo_path}")
+    return timestamps
@@ -0,0 +1,219 @@
+import shutil
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from pydantic import BaseModel
+from git import GitCommandError, Repo
+from config.settings import config
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Worktree(BaseModel):
+    repo_name: str
+    path: Path
+    commit: Optional[str] = None
+    in_use: bool = False
+    last_used: float = 0.0
+
+
+class WorktreePool:
+    """Reusable git worktrees backed by one bare mirror per repository.
+
+    Each acquired worktree belongs to a single instance until released, so
+    instances of the same repository can run side by side. Idle worktrees are
+    handed out again, preferring one already at the requested commit, and the
+    least recently used ones are removed once the pool exceeds its size.
+
+    Only the filesystem ingestion backend reads a checkout. The default git
+    backend reads blobs from the mirror itself through ``mirror``, which
+    never creates or adopts worktrees.
+    """
+
+    def __init__(self, max_worktrees: Optional[int] = None):
+        self.max_worktrees = max_worktrees
+        self._worktrees: Dict[str, List[Worktree]] = {}
+        self._lock = threading.Lock()
+        self._repo_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+    @property
+    def root(self) -> Path:
+        return Path(config.repo_clone_path).resolve()
+
+    def mirror_path(self, repo_name: str) -> Path:
+        return self.root / "_mirrors" / f"{repo_name}.git"
+
+    def mirror(self, repo_url: str, commit: str) -> str:
+        """Return the path of the bare mirror, making sure it contains commit"""
+        repo_name = repo_url.replace("/", "__")
+        with self._repo_lock(repo_name):
+            mirror = self._ensure_mirror(repo_url, repo_name)
+            self._ensure_commit(mirror, commit)
+        return mirror.git_dir
+
+    def acquire(self, repo_url: str, commit: str) -> str:
+        """Return the path of a private worktree checked out at commit"""
+        repo_name = repo_url.replace("/", "__")
+        mirror = Repo(self.mirror(repo_url, commit))
+        self._adopt_worktrees(repo_name, mirror)
+
+        worktree = self._claim(repo_name, commit)
+        try:
+            if worktree.commit is None:
+                logger.info(f"Adding worktree {worktree.path} at {commit}")
+                with self._repo_lock(repo_name):
+                    mirror.git.worktree(
+                        "add", "--detach", "--force", str(worktree.path), commit
+                    )
+            elif worktree.commit != commit:
+                logger.info(f"Switching worktree {worktree.path} to {commit}")
+                self._checkout(worktree, commit)
+            else:
+                self._clean(worktree)
+            worktree.commit = commit
+        except Exception as e:
+            logger.error(f"Repository setup failed: {str(e)}")
+            self._discard(worktree)
+            raise
+
+        self._evict()
+        return str(worktree.path)
+
+    def release(self, path: str):
+        """Return a worktree to the pool for reuse"""
+        with self._lock:
+            for worktree in self._all_worktrees():
+                if worktree.path == Path(path):
+                    worktree.in_use = False
+                    worktree.last_used = time.monotonic()
+                    return
+        logger.warning(f"Released unknown worktree {path}")
+
+    def _repo_lock(self, repo_name: str) -> threading.Lock:
+        with self._lock:
+            return self._repo_locks[repo_name]
+
+    def _all_worktrees(self) -> List[Worktree]:
+        return [w for worktrees in self._worktrees.values() for w in worktrees]
+
+    def _ensure_mirror(self, repo_url: str, repo_name: str) -> Repo:
+        mirror_path = self.mirror_path(repo_name)
+        if not mirror_path.exists():
+            logger.info(f"Cloning {repo_url} to {mirror_path}")
+            tmp_path = mirror_path.with_name(f".{mirror_path.name}.{uuid.uuid4().hex}")
+            legacy_clone = self.root / repo_name
+            try:
+                if (legacy_clone / ".git").exists():
+                    # Seed from a clone made by earlier versions instead of the network
+                    Repo.clone_from(str(legacy_clone), str(tmp_path), mirror=True)
+                    Repo(str(tmp_path)).remotes.origin.set_url(
+                        Repo(str(legacy_clone)).remotes.origin.url
+                    )
+                else:
+                    Repo.clone_from(
+                        config.repo_remote_template.format(repo=repo_url),
+                        str(tmp_path),
+                        bare=True,
+                    )
+                tmp_path.rename(mirror_path)
+            finally:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+
+        return Repo(str(mirror_path))
+
+    def _adopt_worktrees(self, repo_name: str, mirror: Repo):
+        """Pick up worktrees left on disk by an earlier run, once per repository"""
+        with self._repo_lock(repo_name):
+            with self._lock:
+                if repo_name in self._worktrees:
+                    return
+            mirror.git.worktree("prune")
+            worktree_dir = self.root / "_worktrees" / repo_name
+            adopted, path = [], None
+            for line in mirror.git.worktree("list", "--porcelain").splitlines():
+                if line.startswith("worktree "):
+                    path = Path(line[len("worktree ") :])
+                elif line.startswith("HEAD ") and path and path.parent == worktree_dir:
+                    adopted.append(
+                        Worktree(repo_name=repo_name, path=path, commit=line[5:])
+                    )
+            with self._lock:
+                self._worktrees[repo_name] = adopted
+        if adopted:
+            logger.info(f"Reusing {len(adopted)} existing worktrees of {repo_name}")
+
+    def _ensure_commit(self, mirror: Repo, commit: str):
+        """Fetch the commit into the mirror if it is not there yet"""
+        try:
+            mirror.git.cat_file("-e", f"{commit}^{{commit}}")
+            return
+        except GitCommandError:
+            pass
+
+        logger.info(f"Fetching missing commit {commit}")
+        try:
+            mirror.git.fetch("origin", commit)
+        except GitCommandError:
+            mirror.git.fetch("origin", "+refs/heads/*:refs/heads/*", "--tags")
+
+    def _claim(self, repo_name: str, commit: str) -> Worktree:
+        """Reserve an idle worktree, preferring one at commit, or a new slot"""
+        with self._lock:
+            idle = [w for w in self._worktrees[repo_name] if not w.in_use]
+            if idle:
+                worktree = min(idle, key=lambda w: (w.commit != commit, w.last_used))
+            else:
+                path = self.root / "_worktrees" / repo_name / uuid.uuid4().hex[:12]
+                worktree = Worktree(repo_name=repo_name, path=path)
+                self._worktrees[repo_name].append(worktree)
+            worktree.in_use = True
+            return worktree
+
+    def _checkout(self, worktree: Worktree, commit: str):
+        # Only files that differ between the commits are rewritten
+        repo = Repo(str(worktree.path))
+        repo.git.checkout("--detach", "--force", commit)
+        repo.git.clean("-ffdxq")
+
+    def _clean(self, worktree: Worktree):
+        repo = Repo(str(worktree.path))
+        repo.git.reset("--hard", "-q")
+        repo.git.clean("-ffdxq")
+
+    def _discard(self, worktree: Worktree):
+        with self._lock:
+            self._worktrees[worktree.repo_name].remove(worktree)
+        self._remove(worktree)
+
+    def _remove(self, worktree: Worktree):
+        with self._repo_lock(worktree.repo_name):
+            try:
+                Repo(str(self.mirror_path(worktree.repo_name))).git.worktree(
+                    "remove", "--force", str(worktree.path)
+                )
+            except GitCommandError as e:
+                logger.debug(f"git worktree remove failed: {str(e)}")
+            shutil.rmtree(worktree.path, ignore_errors=True)
+
+    def _evict(self):
+        """Remove least recently used idle worktrees beyond the pool size"""
+        limit = self.max_worktrees or config.max_worktrees
+        with self._lock:
+            worktrees = self._all_worktrees()
+            idle = sorted(
+                (w for w in worktrees if not w.in_use), key=lambda w: w.last_used
+            )
+            evicted = idle[: max(len(worktrees) - limit, 0)]
+            for worktree in evicted:
+                self._worktrees[worktree.repo_name].remove(worktree)
+
+        for worktree in evicted:
+            logger.info(f"Evicting worktree {worktree.path}")
+            self._remove(worktree)
+
+
+worktree_pool = WorktreePool()
@@ -1,26 +1,41 @@
 from langchain_core.language_models import BaseLanguageModel
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langgraph.graph import END, StateGraph
 from core.constants import TaskType
-from core.state import WorkflowState
-from core.retriever import HybridRetriever
+from core.state import WorkflowState, state_size
 from agents import CodeAnalyzerAgent, SoftwareEngineerAgent, EditorAgent, ReviewAgent
+from agents.base import BaseAgent
 from config.settings import config
+from typing import Any, Dict
+import logging
 
+logger = logging.getLogger(__name__)
 
-def build_workflow(llm: BaseLanguageModel, retriever: HybridRetriever) -> StateGraph:
+
+def build_workflow(llm: BaseLanguageModel) -> StateGraph:
+    """Build the agent graph, shared by all instances of a run.
+
+    Nothing in the graph is specific to an instance: the retriever of the
+    instance being solved is passed as ``configurable["retriever"]`` when the
+    compiled graph is invoked.
+    """
     workflow = StateGraph(WorkflowState)
 
-    engineer = SoftwareEngineerAgent(llm=llm, retriever=retriever)
+    engineer = SoftwareEngineerAgent(llm=llm)
     analyzer = CodeAnalyzerAgent(llm=llm)
     editor = EditorAgent(llm=llm)
     reviewer = ReviewAgent(llm=llm)
 
-    workflow.add_node(TaskType.SOFTWARE_ENGINEER, engineer.execute)
-    workflow.add_node(TaskType.CODE_ANALYSIS, analyzer.execute)
-    workflow.add_node(TaskType.EDITING, editor.execute)
-    workflow.add_node(TaskType.REVIEW, reviewer.execute)
-    workflow.add_node(TaskType.COMPLETE, lambda state: state)
-    workflow.add_node(TaskType.FAILED, lambda state: state)
+    for task, agent in [
+        (TaskType.SOFTWARE_ENGINEER, engineer),
+        (TaskType.CODE_ANALYSIS, analyzer),
+        (TaskType.EDITING, editor),
+        (TaskType.REVIEW, reviewer),
+    ]:
+        workflow.add_node(task, _agent_node(task, agent))
+    # Terminal nodes change nothing; returning the state would re-apply reducers
+    workflow.add_node(TaskType.COMPLETE, lambda state: {})
+    workflow.add_node(TaskType.FAILED, lambda state: {})
 
     workflow.add_edge(TaskType.SOFTWARE_ENGINEER, TaskType.CODE_ANALYSIS)
 
@@ -67,6 +82,30 @@ def build_workflow(llm: BaseLanguageModel, retriever: HybridRetriever) -> StateG
     return workflow
 
 
+def _agent_node(task: str, agent: BaseAgent) -> RunnableLambda:
+    """Run execute under invoke() and aexecute under ainvoke(), measuring state"""
+
+    def execute(state: WorkflowState, config: RunnableConfig) -> Dict[str, Any]:
+        return _log_state_size(task, state, agent.execute(state, config))
+
+    async def aexecute(state: WorkflowState, config: RunnableConfig) -> Dict[str, Any]:
+        return _log_state_size(task, state, await agent.aexecute(state, config))
+
+    return RunnableLambda(execute, afunc=aexecute, name=task)
+
+
+def _log_state_size(
+    task: str, state: WorkflowState, update: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Log the serialized size of a node's update and of the state it ran on"""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            f"{state['instance_id']} {task}: update {state_size(update)} bytes, "
+            f"state {state_size(state)} bytes"
+        )
+    return update
+
+
 def _detect_stagnation(state: WorkflowState) -> bool:
     """Check for lack of progress"""
     max_analysis = config.workflow.max_analysis_attempts
@@ -74,7 +113,7 @@ def _detect_stagnation(state: WorkflowState) -> bool:
 
     if state["analysis_attempts"] > max_analysis * 2:
         return True
-    if len(state["edit_history"]) > max_review * 3:
+    if state["edit_attempts"] > max_review * 3:
         return True
     return False
 
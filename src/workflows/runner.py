@@ -1,13 +1,26 @@
+import asyncio
 import logging
 
-from typing import List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
 from datasets import load_dataset
 from langchain_core.embeddings import Embeddings
 from langchain_core.language_models import BaseLanguageModel
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+from core.checkpointer import SQLiteCheckpointer
 from core.constants import TaskType
 from core.data_models import InstanceItem
-from core.providers import ProviderFactory
+from core.telemetry import Telemetry
+from core.providers import (
+    CachedEmbeddings,
+    PersistentLLMCache,
+    ProviderFactory,
+    RateLimitedEmbeddings,
+)
 from agents.swe_agent import SWEBenchAgent
+from workflows.graph import build_workflow
 from evaluation.storage import PredictionStore
 from config.settings import config
 
@@ -15,60 +28,192 @@ logger = logging.getLogger(__name__)
 
 
 class WorkflowRunner:
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None):
+        self.provider = ProviderFactory.get_provider(config.models.llm_model)
+        self.llm_cache = self._initialize_llm_cache()
         self.llm, self.embeddings = self._initialize_llm_and_embeddings()
+        # Compiled once; instances run as separate threads of the checkpointer
+        self.app = build_workflow(self.llm).compile(
+            checkpointer=self._initialize_checkpointer()
+        )
+        self.max_workers = min(
+            max_workers or config.evaluation.max_workers,
+            self.provider.max_concurrency,
+        )
+        self.telemetry = Telemetry()
         self.prediction_store = PredictionStore()
         self.processed_instances = set()
+        self.load_existing_predictions()
 
     def _initialize_llm_and_embeddings(self) -> tuple[BaseLanguageModel, Embeddings]:
         """Initialize LLM and embeddings using the provider factory."""
-        provider = ProviderFactory.get_provider(config.models.llm_model)
-
-        llm = provider.create_llm()
-        embeddings = provider.create_embeddings()
+        llm_kwargs = {}
+        if self.llm_cache:
+            llm_kwargs["cache"] = self.llm_cache
+        if config.models.requests_per_second:
+            llm_kwargs["rate_limiter"] = InMemoryRateLimiter(
+                requests_per_second=config.models.requests_per_second
+            )
+
+        llm = self.provider.create_llm(**llm_kwargs)
+        embeddings = RateLimitedEmbeddings(self.provider.create_embeddings())
+        if config.cache.embeddings_enabled:
+            embeddings = CachedEmbeddings(embeddings)
 
         return llm, embeddings
 
+    def _initialize_llm_cache(self) -> Optional[PersistentLLMCache]:
+        """Cache responses only when sampling is deterministic"""
+        if not config.cache.llm_enabled:
+            return None
+        if config.models.temperature > 0:
+            logger.info("LLM response cache disabled for non-zero temperature")
+            return None
+        return PersistentLLMCache()
+
+    def _initialize_checkpointer(self) -> BaseCheckpointSaver:
+        """Checkpoint to SQLite so interrupted instances resume where they stopped"""
+        if not config.cache.checkpoints_enabled:
+            return MemorySaver()
+        checkpointer = SQLiteCheckpointer()
+        interrupted = checkpointer.thread_ids()
+        if interrupted:
+            logger.info(
+                f"Found checkpoints of {len(interrupted)} interrupted instances"
+            )
+        return checkpointer
+
     def process_instances(self, instance_ids: List[str]):
         """Process list of SWE-bench instances"""
         logger.info(f"Starting processing for {len(instance_ids)} instances")
 
         dataset = load_dataset(config.evaluation.dataset_name, split="test")
+        self.run_instances(
+            [
+                InstanceItem.from_huggingface(item)
+                for item in dataset
+                if item["instance_id"] in instance_ids
+            ]
+        )
+
+    def run_instances(self, instances: List[InstanceItem]):
+        """Process instances not predicted yet and save their predictions"""
         valid_instances = [
-            InstanceItem.from_huggingface(item)
-            for item in dataset
-            if item["instance_id"] in instance_ids
-            and item["instance_id"] not in self.processed_instances
+            instance
+            for instance in instances
+            if instance.instance_id not in self.processed_instances
         ]
 
-        for instance in valid_instances:
-            try:
-                result = self._process_single_instance(instance)
-                if result:
-                    self.prediction_store.add_prediction(result)
-                    self.processed_instances.add(instance.instance_id)
-            except Exception as e:
-                logger.error(f"Failed processing {instance.instance_id}: {str(e)}")
-                continue
+        if config.workflow.async_execution:
+            asyncio.run(self._aprocess_instances(valid_instances))
+        elif self.max_workers > 1 and len(valid_instances) > 1:
+            self._process_concurrently(valid_instances)
+        else:
+            for instance in valid_instances:
+                try:
+                    self._record_result(
+                        instance, self._process_single_instance(instance)
+                    )
+                except Exception as e:
+                    logger.error(f"Failed processing {instance.instance_id}: {str(e)}")
+                    continue
 
         self.prediction_store.save()
         logger.info(
-            f"Completed processing. Total successful: {len(self.prediction_store.get_predictions())}"
+            f"Completed processing. Total successful: {len(self.prediction_store.get_processed_ids())}"
         )
+        if self.llm_cache:
+            logger.info(f"LLM cache stats: {self.llm_cache.stats()}")
+        if self.telemetry.enabled:
+            logger.info(f"Time and tokens by node:\n{self.telemetry.summary()}")
+
+    def _process_concurrently(self, instances: List[InstanceItem]):
+        """Run instances on a bounded thread pool, storing results as they finish"""
+        logger.info(f"Processing with {self.max_workers} concurrent workers")
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="instance"
+        ) as executor:
+            futures = {
+                executor.submit(self._process_single_instance, instance): instance
+                for instance in instances
+            }
+            for future in as_completed(futures):
+                instance = futures[future]
+                try:
+                    self._record_result(instance, future.result())
+                except Exception as e:
+                    logger.error(f"Failed processing {instance.instance_id}: {str(e)}")
+
+    async def _aprocess_instances(self, instances: List[InstanceItem]):
+        """Drive instances from one event loop, bounded by max_workers"""
+        logger.info(f"Processing asynchronously with {self.max_workers} workers")
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def run(instance: InstanceItem):
+            async with semaphore:
+                try:
+                    result = await self._aprocess_single_instance(instance)
+                    self._record_result(instance, result)
+                except Exception as e:
+                    logger.error(f"Failed processing {instance.instance_id}: {str(e)}")
+
+        await asyncio.gather(*(run(instance) for instance in instances))
+
+    async def _aprocess_single_instance(self, instance: InstanceItem) -> dict:
+        """Process a single instance, keeping blocking setup off the event loop"""
+        logger.info(f"Processing instance: {instance.instance_id}")
+
+        agent = None
+        with self.telemetry.instance(instance.instance_id) as trace:
+            try:
+                agent = await asyncio.to_thread(
+                    SWEBenchAgent,
+                    instance,
+                    self.llm,
+                    self.embeddings,
+                    self.app,
+                    [trace] if trace else None,
+                )
+
+                result = await agent.arun_workflow()
+
+                return self._format_result(instance, result)
+            except Exception as e:
+                logger.error(f"Error processing {instance.instance_id}: {str(e)}")
+                raise
+            finally:
+                if agent:
+                    agent.close()
+
+    def _record_result(self, instance: InstanceItem, result: Optional[dict]):
+        if result:
+            self.prediction_store.add_prediction(result)
+            self.processed_instances.add(instance.instance_id)
 
     def _process_single_instance(self, instance: InstanceItem) -> dict:
         """Process a single SWE-bench instance"""
         logger.info(f"Processing instance: {instance.instance_id}")
 
-        try:
-            agent = SWEBenchAgent(instance, self.llm, self.embeddings)
+        agent = None
+        with self.telemetry.instance(instance.instance_id) as trace:
+            try:
+                agent = SWEBenchAgent(
+                    instance,
+                    self.llm,
+                    self.embeddings,
+                    self.app,
+                    [trace] if trace else None,
+                )
 
-            result = agent.run_workflow()
+                result = agent.run_workflow()
 
-            return self._format_result(instance, result)
-        except Exception as e:
-            logger.error(f"Error processing {instance.instance_id}: {str(e)}")
-            raise
+                return self._format_result(instance, result)
+            except Exception as e:
+                logger.error(f"Error processing {instance.instance_id}: {str(e)}")
+                raise
+            finally:
+                if agent:
+                    agent.close()
 
     def _format_result(self, instance: InstanceItem, workflow_result: dict) -> dict:
         """Format workflow result into prediction format"""
@@ -93,6 +238,5 @@ class WorkflowRunner:
 
     def load_existing_predictions(self):
         """Load previous predictions from storage"""
-        existing = self.prediction_store.load()
-        self.processed_instances = {p["instance_id"] for p in existing}
-        logger.info(f"Loaded {len(existing)} existing predictions")
+        self.processed_instances = self.prediction_store.get_processed_ids()
+        logger.info(f"Skipping {len(self.processed_instances)} predicted instances")